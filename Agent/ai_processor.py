@@ -6,14 +6,31 @@ AI处理器
 """
 
 import dashscope
+import aiohttp
+import asyncio
+import atexit
 import json
+import msgspec
+import orjson
 import os
 import base64
+import hashlib
+import itertools
 import logging
+import re
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from functools import lru_cache
+from io import BytesIO
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+from PIL import Image
+
 # 添加路径以便导入核心系统
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -34,6 +51,153 @@ if not api_key:
     raise ValueError("Please set the DASHSCOPE_API_KEY environment variable")
 dashscope.api_key = api_key
 
+# DashScope多模态生成HTTP接口
+DASHSCOPE_API_URL = 'https://dashscope.aliyuncs.com/api/v1/services/aigc/multimodal-generation/generation'
+
+# 识别提示词模板（静态部分只构建一次，冰箱状态通过占位符填充）
+_STATIC_PROMPT_TEMPLATE = """你是一个智慧冰箱的AI助手。用户要添加一个新物品到冰箱。
+
+冰箱配置：
+- 2层，每层6个扇区
+- 温度分布：第0层-5°C(冷冻)，第1层4°C(冷藏)
+
+温度选择规则：
+- 水果、蔬菜、乳制品、谷物、烘焙、饮料：选择4°C（第1层）
+- 肉类、海鲜：选择-5°C（第0层）
+- 冰淇淋、冷冻食品：选择-5°C（第0层）
+- 其他：选择4°C（第1层）
+- 非食物物品（乐器、工具等）：选择4°C（第1层）
+
+保质期规则：
+- 水果：3-7天
+- 蔬菜：5-10天
+- 肉类：7-30天
+- 乳制品：7-14天
+- 谷物：3-7天
+- 海鲜：3-7天
+- 烘焙：3-7天
+- 饮料：7-14天
+- 其他：5-10天
+- 非食物物品（乐器、工具等）：长期保存
+
+当前冰箱状态：
+{fridge_status_json}
+
+你的任务：
+1. 识别图片中的物品（可能是食物或非食物）
+2. 判断这种物品的最佳存储温度（-18°C到10°C之间）
+3. 判断这种物品的保质期：
+   - 如果是食物，返回具体的保质期天数（如：7、30等数字）
+   - 如果是非食物（如乐器、工具、玩具等），返回"长期"
+4. 根据最佳温度选择最合适的冰箱层
+5. 在该层找到空闲的扇区
+6. 返回JSON格式的结果，包含：
+   - food_name: 物品名称（保持VLM识别的原始名称，如"玩具车"、"小提琴"等）
+   - optimal_temp: 最佳存储温度（数字，包括负数）
+   - shelf_life_days: 保质期天数（数字，如7、30等，非食物返回"长期"）
+   - category: 物品类别
+   - level: 选择的层数
+   - section: 选择的扇区
+   - reasoning: 选择理由
+
+重要：food_name字段必须保持VLM识别的原始物品名称，不要修改为通用分类名称。
+
+重要提示：
+- 食物分类在以下选项中选择：水果、蔬菜、肉类、乳制品、谷物、海鲜、烘焙、饮料、其他
+
+分类优先级：
+- 三明治、汉堡、披萨、寿司等主食类食物优先分类为"谷物"
+- 只有真正的非食物（乐器、工具、书籍、玩具等）才分类为"非食物"
+- 食物都有保质期，非食物才是长期保存
+- 对于非食物物品，保持原始名称（如"玩具车"、"小提琴"等），不要改为"其他"
+
+识别优先级：
+- 优先识别为食物，除非明确看到乐器、工具、书籍等非食物物品
+- 如果图片模糊或无法识别，默认识别为"其他"食物
+- 不要轻易将物品识别为乐器，除非图片中明确显示乐器
+- 保留VLM的原始识别结果，不要强制修改物品名称
+
+重要：
+1. 请确保选择的层温度与物品的最佳存储温度匹配，水果蔬菜不要放在冷冻层！
+2. 保质期必须是具体的数字天数，不要写"7天"、"30天"，直接写数字7、30
+3. 只有非食物物品才返回"长期"
+4. 如果目标层满了，系统会自动选择温度最接近的其他层
+
+请只返回JSON格式的结果，不要其他文字。"""
+
+# 提示词模板版本号：模板变化时VLM结果缓存自动失效
+_PROMPT_VERSION = hashlib.blake2b(_STATIC_PROMPT_TEMPLATE.encode('utf-8'), digest_size=8).hexdigest()
+
+# 解析识别结果用的预编译正则（避免热路径上的重复编译）
+_DIGITS_RE = re.compile(r'\d+')
+_LONG_TERM_RE = re.compile(r'长期|永久|无保质期|无期限|无限期|不限期')
+_TIME_UNIT_RE = re.compile(r'[天日]')
+
+class _VLMRecognition(msgspec.Struct):
+    """VLM识别结果schema：解析和必填字段校验一次完成"""
+    food_name: str
+    optimal_temp: str | int | float
+    shelf_life_days: str | int
+    category: str
+    level: int
+    section: int
+    freezable: bool = False
+    reasoning: str = ""
+
+
+# 上传前图片预处理参数：限制最长边并重新压缩，减少上传字节和视觉token
+# 768px/q80对扇区内单物品识别足够，payload比1024/q85再小约一半
+_MAX_IMAGE_SIZE = 768
+_JPEG_QUALITY = 80
+
+
+def _compress_image(img: Image.Image) -> bytes:
+    """缩放并重新压缩为上传用JPEG"""
+    # JPEG在解码阶段就按目标尺寸做DCT降采样，不会先解出全分辨率位图再缩
+    img.draft('RGB', (_MAX_IMAGE_SIZE, _MAX_IMAGE_SIZE))
+    img.thumbnail((_MAX_IMAGE_SIZE, _MAX_IMAGE_SIZE), Image.Resampling.LANCZOS)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    buf = BytesIO()
+    img.save(buf, 'JPEG', quality=_JPEG_QUALITY, optimize=True)
+    return buf.getvalue()
+
+
+@lru_cache(maxsize=32)
+def _prepare_image_bytes_cached(image_path: str, mtime: float) -> bytes:
+    """从磁盘读取并压缩图片（按路径+修改时间缓存，重试时不重复编码）"""
+    return _compress_image(Image.open(image_path))
+
+
+def _prepare_image_bytes(image_path: str) -> bytes:
+    """获取上传用的压缩图片字节"""
+    return _prepare_image_bytes_cached(image_path, os.path.getmtime(image_path))
+
+
+def _perceptual_hash(img_bytes: bytes) -> str:
+    """8×8差分哈希：近似相同的画面（按钮双击、放置后复拍）得到相同指纹"""
+    img = Image.open(BytesIO(img_bytes)).convert('L').resize((9, 8), Image.Resampling.BILINEAR)
+    pixels = np.asarray(img, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).reshape(-1)
+    return np.packbits(bits).tobytes().hex()
+
+
+def _wait_image_ready(path: str, timeout: float = 1.0, poll: float = 0.02) -> bool:
+    """等待图片文件写入完成：文件大小在两次采样间保持稳定即视为就绪"""
+    deadline = time.monotonic() + timeout
+    last_size = -1
+    while time.monotonic() < deadline:
+        try:
+            size = os.path.getsize(path)
+            if size > 0 and size == last_size:
+                return True
+            last_size = size
+        except OSError:
+            pass
+        time.sleep(poll)
+    return False
+
+
 class AIProcessor:
     """AI处理器"""
     
@@ -47,10 +211,101 @@ class AIProcessor:
             0: -5,   # 底层：-5°C (冷冻)
             1: 4     # 顶层：4°C (冷藏)
         }
-        
+
+        # 温度→最佳层查找表：工作区间内每个整数温度预先算好最近的层
+        self._temp_lo, self._temp_hi = -20, 12
+        temps = np.arange(self._temp_lo, self._temp_hi + 1)
+        level_temps = np.array([self.temperature_levels[level] for level in range(self.total_levels)])
+        # tolist()后按普通list索引，单次查询不经过NumPy标量装箱
+        self._temp_to_level = np.abs(temps[:, None] - level_temps[None, :]).argmin(axis=1).tolist()
+
         # 加载冰箱数据
         self.fridge_data = self.load_fridge_data()
-        
+
+        # 库存版本号：每次增删+1，Web层按版本号缓存序列化好的响应
+        self.version = 0
+
+        # 增删操作先追加到WAL，积累到阈值再做一次全量快照
+        self._wal_path = self.fridge_data_file + '.wal'
+        self._wal_lock = threading.Lock()
+        self._wal_count = 0
+        self._wal_compact_every = 16
+        self._wal_bytes = 0
+        self._wal_max_bytes = 256 * 1024  # 单条记录可能很大（含reasoning等），按字节也设上限
+        # 批量操作时缓冲WAL行，整批一次写入
+        self._wal_defer_depth = 0
+        self._wal_buffer: List[bytes] = []
+        # 单调累计的追加/截断量：快照只截掉序列化时刻之前的日志前缀，
+        # 序列化之后追加的记录不属于快照内容，崩溃恢复时仍需重放
+        self._wal_appended_count = 0
+        self._wal_appended_bytes = 0
+        self._wal_trimmed_count = 0
+        self._wal_trimmed_bytes = 0
+        self._replay_wal()
+        atexit.register(self._compact_wal)
+
+        # 占用位图：level_usage的内存形式，空位查找为O(1)向量化操作
+        self._occupancy = self._build_occupancy()
+
+        # 槽位数组与正向索引：(层,扇区)→item_id 及 item_id→(层,扇区)
+        self._item_index: Dict[str, Tuple[int, int]] = {}
+        # 物品ID自增序号：与时间戳拼接保证唯一，同秒并发添加不再互相覆盖
+        self._item_seq = itertools.count(1)
+        self._slots = self._build_slots()
+
+        # 过期时间缓存：物品ID列表 + epoch秒数组，剩余天数一次向量运算算完
+        self._item_ids: List[str] = []
+        self._expiries = np.empty(0, dtype=np.int64)
+        self._rebuild_expiry_cache()
+
+        # 异步VLM调用：HTTP会话按事件循环惰性创建，信号量限制并发数
+        # 请求头固定不变，构建一次反复使用
+        self._api_headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sem = asyncio.Semaphore(5)
+        # 图片编码等阻塞工作用专用线程池，不与事件循环默认executor争抢
+        self._api_pool = ThreadPoolExecutor(max_workers=5, thread_name_prefix="qwenvl")
+
+        # 事件内联图片：拍照方把编码好的JPEG随事件直接递过来，省一次磁盘读
+        self._inline_images: OrderedDict = OrderedDict()
+        self._inline_images_max = 8
+        self._inline_images_lock = threading.Lock()
+
+        # 识别提示词缓存：(库存版本号, prompt)
+        self._prompt_cache = (None, None)
+
+        # VLM结果缓存：按压缩图片内容+提示词版本去重，LRU淘汰
+        self._vlm_cache: OrderedDict = OrderedDict()
+        self._vlm_cache_max = 256
+        self._vlm_cache_ttl = 60.0  # 秒，感知哈希只在短窗口内视为同一画面
+        self._vlm_cache_lock = threading.Lock()
+
+        # 数据锁：事件处理在CoreSystem的工作线程里并发进行，增删和快照需要互斥
+        self._data_lock = threading.RLock()
+
+        # 后台保存线程：序列化在调用方完成，磁盘写入不阻塞请求路径
+        self._save_pool = ThreadPoolExecutor(max_workers=1)
+        atexit.register(self._save_pool.shutdown, wait=True)
+
+        # 启动时重放过WAL的话，此刻锁、位图和保存线程池都已就绪，
+        # 立即压缩成新快照并清空日志，避免日志无限增长
+        if self._wal_count > 0:
+            self.save_fridge_data()
+
+        # 批处理事件循环：合并突发拍照事件，并发调用VLM
+        self._batch_max_size = 4
+        self._batch_max_wait = 0.05  # 秒，凑批等待上限（50ms已够合并一次连拍）
+        self._pending_captures: Optional[asyncio.Queue] = None
+        self._prewarmed_at = 0.0  # 预热节流：30秒内只预热一次
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+        asyncio.run_coroutine_threadsafe(self._start_batch_worker(), self._loop).result()
+
         # 注册事件处理器
         self._register_event_handlers()
     
@@ -66,21 +321,26 @@ class AIProcessor:
             data = event.data
             image_path = data.get("image_path")
             camera_type = data.get("camera_type")
-            
+
+            # 拍照方若随事件附带了编码字节，识别就不用再回读磁盘
+            image_bytes = data.get("image_bytes")
+            if image_bytes:
+                self._seed_inline_image(image_path, image_bytes)
+
             if camera_type == "internal":
-                # 内部摄像头拍照，进行物品识别
-                logger.info(f"处理内部摄像头拍照事件: {image_path}")
-                recognition_result = self.process_item_recognition(image_path)
-                
+                # 内部摄像头拍照，排入批处理队列（突发多张时并发识别）
+                logger.info("处理内部摄像头拍照事件: %s", image_path)
+                recognition_result = self._recognize_via_batch(image_path)
+
                 if recognition_result["success"]:
-                    logger.info(f"物品识别和添加成功: {recognition_result.get('item_id')}")
+                    logger.info("物品识别和添加成功: %s", recognition_result.get('item_id'))
                 else:
-                    logger.error(f"物品识别失败: {recognition_result.get('error')}")
+                    logger.error("物品识别失败: %s", recognition_result.get('error'))
             else:
-                logger.info(f"处理外部摄像头拍照事件: {image_path}")
+                logger.info("处理外部摄像头拍照事件: %s", image_path)
                 
         except Exception as e:
-            logger.error(f"处理拍照事件失败: {e}")
+            logger.error("处理拍照事件失败: %s", e)
     
     def _handle_button_press(self, event: SystemEvent):
         """处理按钮事件"""
@@ -90,7 +350,8 @@ class AIProcessor:
             
             if button_type == "place_item":
                 logger.info("处理放入物品按钮事件")
-                # 不直接处理，等待拍照事件
+                # 不直接处理，等待拍照事件；利用间隙预热识别路径
+                asyncio.run_coroutine_threadsafe(self._prewarm(), self._loop)
                 logger.info("等待拍照事件...")
             elif button_type == "take_item":
                 logger.info("处理取出物品按钮事件")
@@ -98,49 +359,134 @@ class AIProcessor:
                 logger.info("等待前端用户选择物品...")
                 
         except Exception as e:
-            logger.error(f"处理按钮事件失败: {e}")
+            logger.error("处理按钮事件失败: %s", e)
     
     def process_item_recognition(self, image_path: str) -> Dict:
         """处理物品识别"""
         try:
-            logger.info(f"开始处理物品识别: {image_path}")
-            
+            logger.info("开始处理物品识别: %s", image_path)
+
             # 调用Qwen-VL进行图像识别
             result = self.call_qwen_vl(image_path, self._get_recognition_prompt())
-            
-            if result["success"]:
-                # 解析识别结果
-                parsed_result = self._parse_recognition_result(result["response"])
-                
-                # 添加到冰箱
-                add_result = self.add_item_to_fridge(parsed_result, image_path)
-                
-                if add_result["success"]:
-                    # 发送物品放置事件
-                    event = core_system.create_event(
-                        EventType.ITEM_PLACED,
-                        "ai_processor",
-                        {
-                            "item_name": parsed_result.get("name"),
-                            "category": parsed_result.get("category"),
-                            "expiry_days": parsed_result.get("expiry_days"),
-                            "temperature_level": add_result.get("temperature_level")
-                        }
-                    )
-                    core_system.emit_event(event)
-                    
-                    logger.info(f"物品识别和添加成功: {parsed_result.get('name')}")
-                    return add_result
-                else:
-                    logger.error(f"添加物品到冰箱失败: {add_result.get('error')}")
-                    return add_result
-            else:
-                logger.error(f"物品识别失败: {result.get('error')}")
-                return result
-                
+            return self._finish_recognition(result, image_path)
+
+        except Exception as e:
+            logger.error("处理物品识别失败: %s", e)
+            return {"success": False, "error": str(e)}
+
+    async def process_item_recognition_async(self, image_path: str) -> Dict:
+        """处理物品识别（异步版本，批处理协程使用）"""
+        try:
+            logger.info("开始处理物品识别: %s", image_path)
+
+            result = await self.call_qwen_vl_async(image_path, self._get_recognition_prompt())
+            return self._finish_recognition(result, image_path)
+
         except Exception as e:
-            logger.error(f"处理物品识别失败: {e}")
+            logger.error("处理物品识别失败: %s", e)
             return {"success": False, "error": str(e)}
+
+    def _finish_recognition(self, result: Dict, image_path: str) -> Dict:
+        """解析VLM识别结果并添加到冰箱"""
+        if result["success"]:
+            # 解析识别结果
+            parsed_result = self._parse_recognition_result(result["response"])
+
+            # 添加到冰箱
+            add_result = self.add_item_to_fridge(parsed_result, image_path)
+
+            if add_result["success"]:
+                # 发送物品放置事件
+                event = core_system.create_event(
+                    EventType.ITEM_PLACED,
+                    "ai_processor",
+                    {
+                        "item_name": parsed_result.get("name"),
+                        "category": parsed_result.get("category"),
+                        "expiry_days": parsed_result.get("expiry_days"),
+                        "temperature_level": add_result.get("temperature_level")
+                    }
+                )
+                core_system.emit_event(event)
+
+                logger.info("物品识别和添加成功: %s", parsed_result.get('name'))
+                return add_result
+            else:
+                logger.error("添加物品到冰箱失败: %s", add_result.get('error'))
+                return add_result
+        else:
+            logger.error("物品识别失败: %s", result.get('error'))
+            return result
+
+    async def _start_batch_worker(self):
+        """在批处理事件循环中创建队列并启动工作协程"""
+        self._pending_captures = asyncio.Queue()
+        self._batch_task = asyncio.get_running_loop().create_task(self._batch_worker())
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        """收集一批待识别请求：拿到第一个后最多再等_batch_max_wait秒凑批"""
+        batch = [await self._pending_captures.get()]
+        deadline = self._loop.time() + self._batch_max_wait
+        while len(batch) < self._batch_max_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._pending_captures.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _prewarm(self):
+        """预热识别路径：在按钮按下到拍照完成的间隙准备好连接和缓存"""
+        if time.monotonic() - self._prewarmed_at < 30:
+            return
+        self._prewarmed_at = time.monotonic()
+        try:
+            # 填充提示词缓存
+            self._get_recognition_prompt()
+            # 唤醒编码线程池
+            self._api_pool.submit(lambda: None)
+            # 提前完成到DashScope的TCP+TLS握手
+            session = await self._get_session()
+            async with session.head(DASHSCOPE_API_URL, allow_redirects=False):
+                pass
+        except Exception as e:
+            logger.debug("预热失败（忽略）: %s", e)
+
+    async def _recognize_and_resolve(self, image_path: str, future: asyncio.Future):
+        """识别单张图片并回填future（各项独立完成，互不等待）"""
+        try:
+            result = await self.process_item_recognition_async(image_path)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        if not future.done():
+            future.set_result(result)
+
+    async def _batch_worker(self):
+        """后台批处理协程：合并突发拍照事件并并发识别
+
+        编码在线程池、API调用受信号量限制、落盘在保存线程，三个阶段
+        天然互相重叠；这里按项启动任务而不是gather整批，快的识别
+        先完成先返回，不被同批慢的卡住。
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                batch = await self._collect_batch()
+                for image_path, future in batch:
+                    loop.create_task(self._recognize_and_resolve(image_path, future))
+            except Exception as e:
+                logger.error("批处理识别出错: %s", e)
+
+    def _recognize_via_batch(self, image_path: str, timeout: float = 60.0) -> Dict:
+        """把识别请求排入批处理队列并等待结果（线程安全）"""
+        async def _enqueue():
+            future = self._loop.create_future()
+            self._pending_captures.put_nowait((image_path, future))
+            return await future
+
+        return asyncio.run_coroutine_threadsafe(_enqueue(), self._loop).result(timeout)
     
     def process_item_placement(self) -> Dict:
         """处理物品放置"""
@@ -154,11 +500,12 @@ class AIProcessor:
             image_path = hardware_manager.capture_image(CameraType.INTERNAL)
             
             if image_path:
-                logger.info(f"拍照成功: {image_path}")
-                
-                # 等待一下确保图片保存完成
-                time.sleep(1)
-                
+                logger.info("拍照成功: %s", image_path)
+
+                # 等待图片写入完成（大小稳定即继续，不再固定等1秒）
+                if not _wait_image_ready(image_path):
+                    logger.warning("等待图片写入超时，继续识别: %s", image_path)
+
                 # 处理物品识别
                 recognition_result = self.process_item_recognition(image_path)
                 
@@ -181,7 +528,7 @@ class AIProcessor:
                 }
             
         except Exception as e:
-            logger.error(f"处理物品放置失败: {e}")
+            logger.error("处理物品放置失败: %s", e)
             return {"success": False, "error": str(e)}
     
     def process_item_removal(self) -> Dict:
@@ -209,113 +556,44 @@ class AIProcessor:
                     )
                     core_system.emit_event(event)
                     
-                    logger.info(f"物品取出成功: {item.get('name')}")
+                    logger.info("物品取出成功: %s", item.get('name'))
                     return remove_result
                 else:
-                    logger.error(f"取出物品失败: {remove_result.get('error')}")
+                    logger.error("取出物品失败: %s", remove_result.get('error'))
                     return remove_result
             else:
                 logger.warning("没有推荐取出的物品")
                 return {"success": False, "error": "没有推荐取出的物品"}
                 
         except Exception as e:
-            logger.error(f"处理物品取出失败: {e}")
+            logger.error("处理物品取出失败: %s", e)
             return {"success": False, "error": str(e)}
     
     def _get_recognition_prompt(self) -> str:
-        """获取识别提示词"""
-        # 获取冰箱当前状态
-        fridge_status = self.get_fridge_status()
-        
-        return f"""你是一个智慧冰箱的AI助手。用户要添加一个新物品到冰箱。
-
-冰箱配置：
-- 2层，每层6个扇区
-- 温度分布：第0层-5°C(冷冻)，第1层4°C(冷藏)
-
-温度选择规则：
-- 水果、蔬菜、乳制品、谷物、烘焙、饮料：选择4°C（第1层）
-- 肉类、海鲜：选择-5°C（第0层）
-- 冰淇淋、冷冻食品：选择-5°C（第0层）
-- 其他：选择4°C（第1层）
-- 非食物物品（乐器、工具等）：选择4°C（第1层）
-
-保质期规则：
-- 水果：3-7天
-- 蔬菜：5-10天
-- 肉类：7-30天
-- 乳制品：7-14天
-- 谷物：3-7天
-- 海鲜：3-7天
-- 烘焙：3-7天
-- 饮料：7-14天
-- 其他：5-10天
-- 非食物物品（乐器、工具等）：长期保存
-
-当前冰箱状态：
-{json.dumps(fridge_status, ensure_ascii=False, indent=2)}
-
-你的任务：
-1. 识别图片中的物品（可能是食物或非食物）
-2. 判断这种物品的最佳存储温度（-18°C到10°C之间）
-3. 判断这种物品的保质期：
-   - 如果是食物，返回具体的保质期天数（如：7、30等数字）
-   - 如果是非食物（如乐器、工具、玩具等），返回"长期"
-4. 根据最佳温度选择最合适的冰箱层
-5. 在该层找到空闲的扇区
-6. 返回JSON格式的结果，包含：
-   - food_name: 物品名称（保持VLM识别的原始名称，如"玩具车"、"小提琴"等）
-   - optimal_temp: 最佳存储温度（数字，包括负数）
-   - shelf_life_days: 保质期天数（数字，如7、30等，非食物返回"长期"）
-   - category: 物品类别
-   - level: 选择的层数
-   - section: 选择的扇区
-   - reasoning: 选择理由
+        """获取识别提示词（按库存版本号缓存）"""
+        # last_update只在快照压缩时变化，用它当键会让VLM拿到落后
+        # 最多一个压缩周期的空位信息；版本号每次增删都递增
+        version = self.version
+        if self._prompt_cache[0] == version:
+            return self._prompt_cache[1]
 
-重要：food_name字段必须保持VLM识别的原始物品名称，不要修改为通用分类名称。
-
-重要提示：
-- 食物分类：请在以下分类中选择最合适的：
-  * 水果：苹果、橙子、香蕉、葡萄、草莓等
-  * 蔬菜：胡萝卜、土豆、洋葱、菠菜、芹菜等
-  * 肉类：牛肉、猪肉、鸡肉、鱼肉等
-  * 乳制品：牛奶、鸡蛋、奶酪、酸奶等
-  * 谷物：面包、米饭、面条、麦片、三明治、汉堡、披萨、寿司等
-  * 海鲜：鱼、虾、蟹、贝类等
-  * 烘焙：蛋糕、饼干、面包、巧克力、冰淇淋等
-  * 饮料：果汁、可乐、啤酒等
-  * 其他：如果找不到对应分类，选择"其他"
-
-分类优先级：
-- 三明治、汉堡、披萨、寿司等主食类食物优先分类为"谷物"
-- 只有真正的非食物（乐器、工具、书籍、玩具等）才分类为"非食物"
-- 食物都有保质期，非食物才是长期保存
-- 对于非食物物品，保持原始名称（如"玩具车"、"小提琴"等），不要改为"其他"
-
-识别优先级：
-- 优先识别为食物，除非明确看到乐器、工具、书籍等非食物物品
-- 如果图片模糊或无法识别，默认识别为"其他"食物
-- 不要轻易将物品识别为乐器，除非图片中明确显示乐器
-- 保留VLM的原始识别结果，不要强制修改物品名称
-
-重要：
-1. 请确保选择的层温度与物品的最佳存储温度匹配，水果蔬菜不要放在冷冻层！
-2. 保质期必须是具体的数字天数，不要写"7天"、"30天"，直接写数字7、30
-3. 只有非食物物品才返回"长期"
-4. 如果目标层满了，系统会自动选择温度最接近的其他层
-
-温度选择优先级：
-- 水果、蔬菜、乳制品、谷物、烘焙、饮料、其他：优先选择2-6°C（第2-3层），绝对不要选择-18°C或-5°C
-- 肉类、海鲜：优先选择-5°C（第1层），其次选择-18°C（第0层）
-- 冷冻食品：选择-18°C（第0层）
+        # 只投影VLM选位真正需要的信息：层温度、空闲扇区、物品总数
+        # 完整库存对选位没有帮助，只会线性膨胀prompt token
+        compact_status = {
+            "temps": self.temperature_levels,
+            "free_slots": [[int(l), int(s)] for l, s in np.argwhere(~self._occupancy)],
+            "total_items": len(self.fridge_data["items"])
+        }
+        fridge_status_json = json.dumps(compact_status, ensure_ascii=False, separators=(',', ':'))
+        prompt = _STATIC_PROMPT_TEMPLATE.format(fridge_status_json=fridge_status_json)
+        self._prompt_cache = (version, prompt)
+        return prompt
 
-请只返回JSON格式的结果，不要其他文字。"""
-    
     def _parse_recognition_result(self, response: str) -> Dict:
         """解析识别结果"""
         try:
             # 添加调试信息
-            logger.info(f"🔍 VLM原始响应: {response}")
+            logger.info("🔍 VLM原始响应: %s", response)
             
             # 尝试提取JSON部分
             start_idx = response.find('{')
@@ -323,37 +601,39 @@ class AIProcessor:
             
             if start_idx != -1 and end_idx != 0:
                 json_str = response[start_idx:end_idx]
-                food_info = json.loads(json_str)
-                
-                # 验证必要字段
-                required_fields = ["food_name", "optimal_temp", "shelf_life_days", "category", "level", "section"]
-                for field in required_fields:
-                    if field not in food_info:
-                        logger.warning(f"识别结果缺少字段: {field}")
+
+                # msgspec一次完成解析和必填字段校验
+                try:
+                    food_info = msgspec.json.decode(json_str.encode('utf-8'), type=_VLMRecognition)
+                except msgspec.DecodeError:
+                    # 贪婪的大括号区间可能裹进多余文本（如两个JSON对象），
+                    # 退回流式解析，从第一个'{'取出第一个完整对象
+                    try:
+                        obj, _ = json.JSONDecoder().raw_decode(response, start_idx)
+                        food_info = msgspec.convert(obj, _VLMRecognition)
+                    except (ValueError, msgspec.ValidationError) as e:
+                        logger.warning("识别结果不符合schema: %s", e)
                         return self._get_default_recognition_result()
-                
+
                 # 转换字段名以匹配原有格式
                 result = {
-                    "name": food_info["food_name"],
-                    "category": food_info["category"],
-                    "optimal_temperature": self._parse_temperature(food_info["optimal_temp"]),
-                    "expiry_days": self._parse_shelf_life(food_info["shelf_life_days"]),
-                    "freezable": food_info.get("freezable", False),
-                    "level": food_info["level"],
-                    "section": food_info["section"],
-                    "reasoning": food_info.get("reasoning", "")
+                    "name": food_info.food_name,
+                    "category": food_info.category,
+                    "optimal_temperature": self._parse_temperature(food_info.optimal_temp),
+                    "expiry_days": self._parse_shelf_life(food_info.shelf_life_days),
+                    "freezable": food_info.freezable,
+                    "level": food_info.level,
+                    "section": food_info.section,
+                    "reasoning": food_info.reasoning
                 }
-                
+
                 return result
             else:
                 logger.warning("无法从响应中提取JSON")
                 return self._get_default_recognition_result()
-                
-        except json.JSONDecodeError as e:
-            logger.error(f"解析JSON失败: {e}")
-            return self._get_default_recognition_result()
+
         except Exception as e:
-            logger.error(f"解析识别结果失败: {e}")
+            logger.error("解析识别结果失败: %s", e)
             return self._get_default_recognition_result()
     
     def _get_default_value(self, field: str):
@@ -371,16 +651,14 @@ class AIProcessor:
         """解析温度字符串，提取数字部分（包括负数）"""
         try:
             temp_str = str(temp_str).strip()
-            
+
             # 检查是否包含负号
             is_negative = '-' in temp_str
-            
-            # 提取数字部分
-            import re
-            numbers = re.findall(r'\d+', temp_str)
-            if numbers:
-                # 取第一个数字作为温度值
-                result = int(numbers[0])
+
+            # 提取第一个数字作为温度值
+            match = _DIGITS_RE.search(temp_str)
+            if match:
+                result = int(match.group())
                 # 如果原字符串包含负号，则返回负数
                 if is_negative:
                     result = -result
@@ -389,33 +667,30 @@ class AIProcessor:
                 return 4  # 默认温度
         except:
             return 4  # 默认温度
-    
+
     def _parse_shelf_life(self, shelf_life_str: str) -> int:
         """解析保质期字符串，提取数字部分"""
         try:
-            shelf_life_str_lower = str(shelf_life_str).lower()
-            
-            # 检查是否包含长期保存的关键词
-            long_term_keywords = ['长期', '永久', '无保质期', '无期限', '长期保存', '无限期', '不限期']
-            if any(keyword in shelf_life_str_lower for keyword in long_term_keywords):
-                return -1  # 表示长期保存
-            
-            # 如果输入是纯数字，直接转换
+            # 如果输入是纯数字，直接转换（快速路径）
             try:
                 result = int(shelf_life_str)
                 if result > 0:  # 确保是正数
                     return result
-            except ValueError:
+            except (ValueError, TypeError):
                 pass
-            
+
+            shelf_life_str = str(shelf_life_str)
+
+            # 检查是否包含长期保存的关键词
+            if _LONG_TERM_RE.search(shelf_life_str):
+                return -1  # 表示长期保存
+
             # 检查是否包含"天"、"日"等时间单位
-            if '天' in shelf_life_str or '日' in shelf_life_str:
-                # 提取数字
-                import re
-                numbers = re.findall(r'\d+', str(shelf_life_str))
-                if numbers:
-                    return int(numbers[0])
-            
+            if _TIME_UNIT_RE.search(shelf_life_str):
+                match = _DIGITS_RE.search(shelf_life_str)
+                if match:
+                    return int(match.group())
+
             # 默认保质期
             return 7
         except:
@@ -431,144 +706,226 @@ class AIProcessor:
             "freezable": False
         }
     
-    def call_qwen_vl(self, image_path: str, prompt: str) -> Dict:
-        """调用Qwen-VL模型"""
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """获取绑定到当前事件循环的HTTP会话（惰性创建）"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            # keep-alive连接池按并发上限配置，复用TLS会话避免每次握手
+            connector = aiohttp.TCPConnector(limit=16, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._session_loop = loop
+        return self._session
+
+    def _prepare_upload(self, image_path: str) -> Tuple[str, str]:
+        """压缩图片并构建base64 data URI和内容缓存键（在线程池中执行）
+
+        直接在bytes上拼接前缀再解码，避免f-string插值多复制一份大payload。
+        """
+        raw = self._take_inline_image(image_path)
+        if raw is not None:
+            img_bytes = _compress_image(Image.open(BytesIO(raw)))
+        else:
+            img_bytes = _prepare_image_bytes(image_path)
+        digest = _perceptual_hash(img_bytes)
+        encoded = b'data:image/jpeg;base64,' + base64.b64encode(img_bytes)
+        return encoded.decode('ascii'), f"{digest}:{_PROMPT_VERSION}"
+
+    def _seed_inline_image(self, image_path: str, image_bytes: bytes):
+        """登记随事件递来的图片字节（按路径索引，容量有限）"""
+        with self._inline_images_lock:
+            self._inline_images[image_path] = image_bytes
+            while len(self._inline_images) > self._inline_images_max:
+                self._inline_images.popitem(last=False)
+
+    def _take_inline_image(self, image_path: str) -> Optional[bytes]:
+        """取走内联图片字节（一次性使用）"""
+        with self._inline_images_lock:
+            return self._inline_images.pop(image_path, None)
+
+    def _vlm_cache_get(self, key: str) -> Optional[Dict]:
+        """查询VLM结果缓存（命中则移到队尾，超过TTL的条目作废）"""
+        with self._vlm_cache_lock:
+            entry = self._vlm_cache.get(key)
+            if entry is None:
+                return None
+            stamp, result = entry
+            if time.monotonic() - stamp > self._vlm_cache_ttl:
+                del self._vlm_cache[key]
+                return None
+            self._vlm_cache.move_to_end(key)
+            return result
+
+    def _vlm_cache_put(self, key: str, value: Dict):
+        """写入VLM结果缓存并按LRU淘汰"""
+        with self._vlm_cache_lock:
+            self._vlm_cache[key] = (time.monotonic(), value)
+            self._vlm_cache.move_to_end(key)
+            while len(self._vlm_cache) > self._vlm_cache_max:
+                self._vlm_cache.popitem(last=False)
+
+    @staticmethod
+    def _extract_response_text(content) -> str:
+        """从API响应content中提取文本"""
+        if isinstance(content, list):
+            # 如果是列表，取第一个文本元素
+            content = content[0]
+        if isinstance(content, dict) and 'text' in content:
+            return content['text']
+        return content if isinstance(content, str) else str(content)
+
+    async def call_qwen_vl_async(self, image_path: str, prompt: str) -> Dict:
+        """异步调用Qwen-VL模型（并发受信号量限制）"""
         try:
-            # 检查图片文件是否存在
-            if not os.path.exists(image_path):
+            # 检查图片来源：要么事件里带了字节，要么磁盘上有文件
+            if image_path not in self._inline_images and not os.path.exists(image_path):
                 return {"success": False, "error": f"图片文件不存在: {image_path}"}
-            
-            # 读取并编码图片
-            with open(image_path, 'rb') as image_file:
-                image_data = image_file.read()
-                image_base64 = base64.b64encode(image_data).decode('utf-8')
-            
-            # 调用Qwen-VL API
-            response = dashscope.MultiModalConversation.call(
-                model='qwen-vl-plus',
-                messages=[
-                    {
-                        'role': 'user',
-                        'content': [
-                            {'image': f"data:image/jpeg;base64,{image_base64}"},
-                            {'text': prompt}
-                        ]
-                    }
-                ]
-            )
-            
-            if response.status_code == 200:
-                # 添加调试信息
-                logger.info(f"API响应结构: {response.output}")
-                
-                # 正确解析响应
-                try:
-                    # 获取响应文本
-                    response_text = response.output.choices[0].message.content
-                    if isinstance(response_text, list):
-                        # 如果是列表，取第一个文本元素
-                        response_text = response_text[0]
-                    
-                    if isinstance(response_text, dict) and 'text' in response_text:
-                        response_text = response_text['text']
-                    elif isinstance(response_text, str):
-                        # 已经是字符串
-                        pass
-                    else:
-                        # 尝试其他可能的格式
-                        response_text = str(response_text)
-                    
-                    return {
-                        "success": True,
-                        "response": response_text
-                    }
-                except Exception as parse_error:
-                    logger.error(f"解析API响应失败: {parse_error}")
-                    return {
-                        "success": False,
-                        "error": f"解析响应失败: {parse_error}"
-                    }
-            else:
-                return {
-                    "success": False,
-                    "error": f"API调用失败: {response.code} - {response.message}"
+
+            # 在专用线程池中读取并编码图片，避免阻塞事件循环
+            loop = asyncio.get_running_loop()
+            image_uri, cache_key = await loop.run_in_executor(self._api_pool, self._prepare_upload, image_path)
+
+            # 相同图片+相同提示词版本直接复用上次结果
+            cached = self._vlm_cache_get(cache_key)
+            if cached is not None:
+                logger.info("VLM结果缓存命中: %s", image_path)
+                return cached
+
+            payload = {
+                "model": "qwen-vl-plus",
+                "input": {
+                    "messages": [
+                        {
+                            "role": "user",
+                            "content": [
+                                {"image": image_uri},
+                                {"text": prompt}
+                            ]
+                        }
+                    ]
                 }
-                
+            }
+            # 信号量限制并发请求数，避免压垮API
+            async with self._sem:
+                session = await self._get_session()
+                # 大payload（含base64图片）用orjson序列化，比aiohttp默认的stdlib json快数倍
+                async with session.post(DASHSCOPE_API_URL, data=orjson.dumps(payload),
+                                        headers=self._api_headers) as response:
+                    result = await response.json()
+
+                    if response.status == 200:
+                        # 添加调试信息
+                        logger.info("API响应结构: %s", result.get('output'))
+
+                        try:
+                            content = result["output"]["choices"][0]["message"]["content"]
+                            success_result = {
+                                "success": True,
+                                "response": self._extract_response_text(content)
+                            }
+                            # 只缓存成功结果，失败的调用应当重试
+                            self._vlm_cache_put(cache_key, success_result)
+                            return success_result
+                        except Exception as parse_error:
+                            logger.error("解析API响应失败: %s", parse_error)
+                            return {
+                                "success": False,
+                                "error": f"解析响应失败: {parse_error}"
+                            }
+                    else:
+                        return {
+                            "success": False,
+                            "error": f"API调用失败: {result.get('code')} - {result.get('message')}"
+                        }
+
         except Exception as e:
-            logger.error(f"调用Qwen-VL失败: {e}")
+            logger.error("调用Qwen-VL失败: %s", e)
             return {"success": False, "error": str(e)}
+
+    def call_qwen_vl(self, image_path: str, prompt: str) -> Dict:
+        """调用Qwen-VL模型（同步接口，兼容旧调用方）"""
+        return asyncio.run_coroutine_threadsafe(
+            self.call_qwen_vl_async(image_path, prompt), self._loop
+        ).result()
+
+    async def process_batch(self, image_paths: List[str]) -> List[Dict]:
+        """并发识别多张图片并依次添加到冰箱"""
+        prompt = self._get_recognition_prompt()
+        vlm_results = await asyncio.gather(
+            *[self.call_qwen_vl_async(path, prompt) for path in image_paths]
+        )
+
+        results = []
+        # 整批共享一个持久化事务：N次添加只落一次盘
+        with self.deferred_persistence():
+            for image_path, result in zip(image_paths, vlm_results):
+                if result["success"]:
+                    parsed_result = self._parse_recognition_result(result["response"])
+                    results.append(self.add_item_to_fridge(parsed_result, image_path))
+                else:
+                    results.append(result)
+        return results
     
     def add_item_to_fridge(self, item_info: Dict, image_path: str) -> Dict:
         """添加物品到冰箱"""
         try:
-            # 使用大模型推荐的层和扇区
-            level = item_info.get("level", 2)
-            section = item_info.get("section", 0)
-            shelf_life_days = item_info.get("expiry_days", 7)
-            
-            # 检查扇区是否可用
-            level_str = str(level)
-            section_str = str(section)
-            
-            if self.fridge_data["level_usage"][level_str][section_str]:
-                # 如果推荐的扇区被占用，寻找其他可用扇区
-                available_section = None
-                for sec in range(6):  # 每层6个扇区
-                    if not self.fridge_data["level_usage"][level_str][str(sec)]:
-                        available_section = sec
-                        break
-                
-                if available_section is not None:
-                    section = available_section
-                    section_str = str(section)
-                else:
-                    # 如果该层没有可用扇区，寻找其他层
-                    for lvl in range(2):  # 2层
-                        lvl_str = str(lvl)
-                        for sec in range(6):
-                            if not self.fridge_data["level_usage"][lvl_str][str(sec)]:
-                                level = lvl
-                                section = sec
-                                level_str = str(level)
-                                section_str = str(section)
-                                break
-                        if not self.fridge_data["level_usage"][level_str][section_str]:
-                            break
-                    
-                    if self.fridge_data["level_usage"][level_str][section_str]:
+            with self._data_lock:
+                # 使用大模型推荐的层和扇区
+                level = item_info.get("level", 2)
+                section = item_info.get("section", 0)
+                shelf_life_days = item_info.get("expiry_days", 7)
+
+                # 检查建议位置是否合法且空闲：level/section来自VLM输出，
+                # 越界值（尤其是负数，NumPy负索引会静默回绕到别的槽位）
+                # 和被占用一样走空位兜底
+                valid = (0 <= level < self.total_levels
+                         and 0 <= section < self.sections_per_level)
+                if not valid or self._occupancy[level, section]:
+                    free = np.argwhere(~self._occupancy)
+                    if len(free) == 0:
                         return {"success": False, "error": "冰箱已满"}
+
+                    # 优先选择同层的空扇区，否则取任意空位
+                    same_level = free[free[:, 0] == level]
+                    chosen = same_level[0] if len(same_level) else free[0]
+                    level, section = int(chosen[0]), int(chosen[1])
+
+                # 生成物品ID：时间戳后缀加自增序号，同一秒内连续添加（批量识别）也不会撞号
+                now = datetime.now()
+                item_id = f"item_{int(now.timestamp())}_{next(self._item_seq)}"
+
+                # 计算过期日期（ISO串供展示，epoch秒供数值比较）
+                if shelf_life_days == -1:
+                    # 长期保存
+                    expiry_dt = now + timedelta(days=36500)  # 100年后
+                else:
+                    expiry_dt = now + timedelta(days=shelf_life_days)
+                expiry_date = expiry_dt.isoformat()
             
-            # 生成物品ID
-            item_id = f"item_{int(time.time())}"
-            
-            # 计算过期日期
-            if shelf_life_days == -1:
-                # 长期保存
-                expiry_date = (datetime.now() + timedelta(days=36500)).isoformat()  # 100年后
-            else:
-                expiry_date = (datetime.now() + timedelta(days=shelf_life_days)).isoformat()
-            
-            # 添加到冰箱数据
-            self.fridge_data["items"][item_id] = {
-                "name": item_info.get("name", "未知食物"),
-                "category": item_info.get("category", "其他"),
-                "level": level,
-                "section": section,
-                "optimal_temperature": item_info.get("optimal_temperature", 4),
-                "expiry_date": expiry_date,
-                "added_date": datetime.now().isoformat(),
-                "image_path": image_path,
-                "freezable": item_info.get("freezable", False),
-                "reasoning": item_info.get("reasoning", "")
-            }
-            
-            # 更新层和扇区占用状态
-            self.fridge_data["level_usage"][level_str][section_str] = True
+                # 添加到冰箱数据
+                self.fridge_data["items"][item_id] = {
+                    "name": item_info.get("name", "未知食物"),
+                    "category": item_info.get("category", "其他"),
+                    "level": level,
+                    "section": section,
+                    "optimal_temperature": item_info.get("optimal_temperature", 4),
+                    "expiry_date": expiry_date,
+                    "expiry_ts": int(expiry_dt.timestamp()),
+                    "added_date": now.isoformat(),
+                    "image_path": image_path,
+                    "freezable": item_info.get("freezable", False),
+                    "reasoning": item_info.get("reasoning", "")
+                }
             
-            # 保存数据
-            self.save_fridge_data()
+                # 更新层和扇区占用状态与过期缓存
+                self._occupancy[level, section] = True
+                self._slots[level, section] = item_id
+                self._item_index[item_id] = (level, section)
+                self._rebuild_expiry_cache()
+
+                # 追加变更日志（积累到阈值时自动做全量快照）
+                self._log_mutation({"op": "add", "id": item_id, "item": self.fridge_data["items"][item_id]})
             
-            logger.info(f"物品添加成功: {item_info.get('name')} -> 第{level}层第{section}扇区")
+            logger.info("物品添加成功: %s -> 第%s层第%s扇区", item_info.get('name'), level, section)
             
             return {
                 "success": True,
@@ -579,57 +936,46 @@ class AIProcessor:
             }
             
         except Exception as e:
-            logger.error(f"添加物品到冰箱失败: {e}")
+            logger.error("添加物品到冰箱失败: %s", e)
             return {"success": False, "error": str(e)}
     
     def _find_available_position(self, level: int) -> Optional[Dict]:
-        """找到可用位置"""
-        if level not in self.fridge_data["levels"]:
+        """找到可用位置（直接查占用位图）"""
+        if not 0 <= level < self.total_levels:
             return None
-        
-        level_data = self.fridge_data["levels"][level]
-        for section in range(self.sections_per_level):
-            if level_data["sections"][section] is None:
-                return {"level": level, "section": section}
-        
+
+        free = np.flatnonzero(~self._occupancy[level])
+        if free.size:
+            return {"level": level, "section": int(free[0])}
+
         return None
     
     def find_best_temperature_level(self, optimal_temp: float) -> int:
-        """找到最佳温度层"""
-        best_level = 2  # 默认冷藏层
-        min_diff = float('inf')
-        
-        for level, temp in self.temperature_levels.items():
-            diff = abs(temp - optimal_temp)
-            if diff < min_diff:
-                min_diff = diff
-                best_level = level
-        
-        return best_level
+        """找到最佳温度层（查表，O(1)）"""
+        temp = max(self._temp_lo, min(self._temp_hi, int(round(optimal_temp))))
+        return self._temp_to_level[temp - self._temp_lo]
     
     def get_item_from_fridge(self, item_id: str) -> Dict:
         """从冰箱中取出物品"""
         try:
-            if item_id not in self.fridge_data["items"]:
-                return {"success": False, "error": "物品不存在"}
-            
-            item = self.fridge_data["items"][item_id]
-            level = item["level"]
-            section = item["section"]
-            
-            # 从冰箱数据中移除
-            del self.fridge_data["items"][item_id]
-            
-            # 更新层级使用情况
-            level_str = str(level)
-            section_str = str(section)
-            if level_str in self.fridge_data["level_usage"] and section_str in self.fridge_data["level_usage"][level_str]:
-                self.fridge_data["level_usage"][level_str][section_str] = False
-            
-            # 保存数据
-            self.save_fridge_data()
+            with self._data_lock:
+                # pop一次完成存在性检查+读取+移除
+                item = self.fridge_data["items"].pop(item_id, None)
+                if item is None:
+                    return {"success": False, "error": "物品不存在"}
+
+                level, section = self._item_index.pop(item_id, (item["level"], item["section"]))
+
+                # 更新层级使用情况与过期缓存
+                if 0 <= level < self.total_levels and 0 <= section < self.sections_per_level:
+                    self._occupancy[level, section] = False
+                    self._slots[level, section] = None
+                self._rebuild_expiry_cache()
+
+                # 追加变更日志（积累到阈值时自动做全量快照）
+                self._log_mutation({"op": "remove", "id": item_id})
             
-            logger.info(f"物品取出成功: {item['name']}")
+            logger.info("物品取出成功: %s", item['name'])
             
             return {
                 "success": True,
@@ -638,14 +984,17 @@ class AIProcessor:
             }
             
         except Exception as e:
-            logger.error(f"取出物品失败: {e}")
+            logger.error("取出物品失败: %s", e)
             return {"success": False, "error": str(e)}
     
-    def get_recommendations(self) -> Dict:
+    def get_recommendations(self, now: Optional[datetime] = None) -> Dict:
         """获取智能推荐 - 调用大模型生成基于食物关系、保质期、用户偏好和时间的推荐"""
         try:
+            # 整个请求路径共用一个时间戳，避免重复取系统时钟
+            now = now or datetime.now()
+
             # 获取冰箱当前状态
-            fridge_status = self.get_fridge_status()
+            fridge_status = self.get_fridge_status(now=now)
             
             # 构建系统提示词
             system_prompt = f"""你是一个智慧冰箱的AI助手。用户想要获取关于冰箱内容的智能推荐。
@@ -657,7 +1006,7 @@ class AIProcessor:
 当前冰箱状态：
 {json.dumps(fridge_status, ensure_ascii=False, indent=2)}
 
-当前时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+当前时间：{now.strftime('%Y-%m-%d %H:%M:%S')}
 
 你的任务：
 分析冰箱中的物品，提供智能推荐。考虑以下因素：
@@ -734,20 +1083,24 @@ class AIProcessor:
                             for item in rec.get("items", []):
                                 processed_recommendations["expiring_soon_items"].append(item)
                     
-                    # 设置推荐取出的物品（优先过期物品）
+                    # 设置推荐取出的物品（优先过期物品，同类中取最早过期的）
                     if processed_recommendations["expired_items"]:
+                        earliest = min(processed_recommendations["expired_items"],
+                                       key=lambda it: it.get("days_remaining", 0))
                         processed_recommendations["take_out_item"] = {
-                            "id": processed_recommendations["expired_items"][0]["item_id"],
-                            "name": processed_recommendations["expired_items"][0]["name"],
-                            "category": processed_recommendations["expired_items"][0]["category"],
+                            "id": earliest["item_id"],
+                            "name": earliest["name"],
+                            "category": earliest["category"],
                             "reason": "已过期"
                         }
                         processed_recommendations["suggestions"].append("发现过期物品，建议立即取出")
                     elif processed_recommendations["expiring_soon_items"]:
+                        earliest = min(processed_recommendations["expiring_soon_items"],
+                                       key=lambda it: it.get("days_remaining", 0))
                         processed_recommendations["take_out_item"] = {
-                            "id": processed_recommendations["expiring_soon_items"][0]["item_id"],
-                            "name": processed_recommendations["expiring_soon_items"][0]["name"],
-                            "category": processed_recommendations["expiring_soon_items"][0]["category"],
+                            "id": earliest["item_id"],
+                            "name": earliest["name"],
+                            "category": earliest["category"],
                             "reason": "即将过期"
                         }
                         processed_recommendations["suggestions"].append("发现即将过期的物品，建议优先食用")
@@ -767,21 +1120,24 @@ class AIProcessor:
                 
         except Exception as e:
             # 如果完全失败，使用模拟数据
-            return self._generate_mock_recommendations(self.get_fridge_status())
+            return self._generate_mock_recommendations(self.get_fridge_status(now=now))
     
     def _generate_mock_recommendations(self, fridge_status: Dict) -> Dict:
         """生成模拟推荐数据"""
         recommendations = []
         
         # 分析冰箱中的物品
+        # 库存上限是 total_levels × sections_per_level = 12 个槽位，
+        # 单次Python遍历远低于任何向量化/JIT方案的固定开销，不值得引入numba
         inventory = fridge_status.get("inventory", [])
+        expired_items = []
         expiring_items = []
         fresh_items = []
         long_term_items = []
         
         for item in inventory:
             if item.get("is_expired", False):
-                expiring_items.append(item)
+                expired_items.append(item)
             elif item.get("days_remaining", 0) <= 2:
                 expiring_items.append(item)
             elif item.get("days_remaining", 0) > 30:
@@ -790,12 +1146,13 @@ class AIProcessor:
                 fresh_items.append(item)
         
         # 生成推荐
-        if expiring_items:
+        urgent_items = expired_items + expiring_items
+        if urgent_items:
             recommendations.append({
                 "type": "expiring_soon",
-                "title": f"即将过期的物品 ({len(expiring_items)}个)",
-                "items": expiring_items,
-                "message": f"有{len(expiring_items)}个物品即将过期，建议尽快食用或处理。",
+                "title": f"即将过期的物品 ({len(urgent_items)}个)",
+                "items": urgent_items,
+                "message": f"有{len(urgent_items)}个物品即将过期，建议尽快食用或处理。",
                 "action": "立即检查并处理过期物品",
                 "priority": 1
             })
@@ -832,55 +1189,52 @@ class AIProcessor:
             })
         
         # 处理推荐数据，转换为web_manager期望的格式
+        # 过期/即将过期列表在上面的单次遍历中已经得到，不再重扫推荐列表
         processed_recommendations = {
             "success": True,
-            "expired_items": [],
-            "expiring_soon_items": [],
+            "expired_items": expired_items,
+            "expiring_soon_items": expiring_items,
             "take_out_item": None,
             "suggestions": [],
             "ai_recommendations": recommendations,
             "total_recommendations": len(recommendations),
             "summary": "基于当前冰箱状态生成的智能推荐"
         }
-        
-        # 从推荐中提取过期和即将过期的物品
-        for rec in recommendations:
-            if rec.get("type") == "expired":
-                for item in rec.get("items", []):
-                    processed_recommendations["expired_items"].append(item)
-            elif rec.get("type") == "expiring_soon":
-                for item in rec.get("items", []):
-                    processed_recommendations["expiring_soon_items"].append(item)
-        
-        # 设置推荐取出的物品（优先过期物品）
+
+        # 设置推荐取出的物品（优先过期物品，同类中取最早过期的）
         if processed_recommendations["expired_items"]:
+            earliest = min(processed_recommendations["expired_items"],
+                           key=lambda it: it.get("days_remaining", 0))
             processed_recommendations["take_out_item"] = {
-                "id": processed_recommendations["expired_items"][0]["item_id"],
-                "name": processed_recommendations["expired_items"][0]["name"],
-                "category": processed_recommendations["expired_items"][0]["category"],
+                "id": earliest["item_id"],
+                "name": earliest["name"],
+                "category": earliest["category"],
                 "reason": "已过期"
             }
             processed_recommendations["suggestions"].append("发现过期物品，建议立即取出")
         elif processed_recommendations["expiring_soon_items"]:
+            earliest = min(processed_recommendations["expiring_soon_items"],
+                           key=lambda it: it.get("days_remaining", 0))
             processed_recommendations["take_out_item"] = {
-                "id": processed_recommendations["expiring_soon_items"][0]["item_id"],
-                "name": processed_recommendations["expiring_soon_items"][0]["name"],
-                "category": processed_recommendations["expiring_soon_items"][0]["category"],
+                "id": earliest["item_id"],
+                "name": earliest["name"],
+                "category": earliest["category"],
                 "reason": "即将过期"
             }
             processed_recommendations["suggestions"].append("发现即将过期的物品，建议优先食用")
         
         return processed_recommendations
     
-    def get_fridge_status(self) -> Dict:
+    def get_fridge_status(self, now: Optional[datetime] = None) -> Dict:
         """获取冰箱当前状态"""
-        current_time = datetime.now()
+        current_time = now or datetime.now()
+        days_vector = self._expiry_days(current_time)
         inventory = []
-        
-        for item_id, item in self.fridge_data["items"].items():
-            expiry_date = datetime.fromisoformat(item["expiry_date"])
-            days_remaining = (expiry_date - current_time).days
-            
+
+        for idx, item_id in enumerate(self._item_ids):
+            item = self.fridge_data["items"][item_id]
+            days_remaining = int(days_vector[idx])
+
             inventory.append({
                 "item_id": item_id,
                 "name": item["name"],
@@ -914,6 +1268,7 @@ class AIProcessor:
                     "section": item_data["section"],
                     "optimal_temperature": item_data.get("optimal_temp", 4),
                     "expiry_date": item_data["expiry_date"],
+                    "expiry_ts": item_data.get("expiry_ts"),
                     "added_date": item_data.get("added_time", item_data.get("added_date", ""))
                 })
             
@@ -923,39 +1278,84 @@ class AIProcessor:
             }
             
         except Exception as e:
-            logger.error(f"获取冰箱库存失败: {e}")
+            logger.error("获取冰箱库存失败: %s", e)
             return {"success": False, "error": str(e)}
     
     def load_fridge_data(self) -> Dict:
         """加载冰箱数据"""
         try:
-            if os.path.exists(self.fridge_data_file):
-                with open(self.fridge_data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                # 确保数据格式正确
-                if "items" not in data:
-                    data["items"] = {}
-                if "level_usage" not in data:
-                    data["level_usage"] = self._initialize_level_usage()
-                if "last_update" not in data:
-                    data["last_update"] = datetime.now().isoformat()
-                
-                return data
-            else:
+            # 直接尝试打开，不先exists()多做一次stat
+            try:
+                with open(self.fridge_data_file, 'rb') as f:
+                    # orjson直接解析字节，省去UTF-8解码出中间str的那一遍
+                    data = orjson.loads(f.read())
+            except FileNotFoundError:
                 return self.initialize_fridge_data()
+
+            # 确保数据格式正确
+            if "items" not in data:
+                data["items"] = {}
+            if "level_usage" not in data:
+                data["level_usage"] = self._initialize_level_usage()
+            if "last_update" not in data:
+                data["last_update"] = datetime.now().isoformat()
+
+            # 旧数据补齐epoch字段，解析ISO只在加载时发生这一次
+            for item in data["items"].values():
+                if "expiry_ts" not in item:
+                    item["expiry_ts"] = int(datetime.fromisoformat(item["expiry_date"]).timestamp())
+
+            return data
         except Exception as e:
-            logger.error(f"加载冰箱数据失败: {e}")
+            logger.error("加载冰箱数据失败: %s", e)
             return self.initialize_fridge_data()
     
+    def _rebuild_expiry_cache(self):
+        """重建过期时间缓存（物品增删时调用）
+
+        expiry_ts在写入时已是epoch整数，重建不再解析ISO字符串。
+        """
+        items = self.fridge_data["items"]
+        self._item_ids = list(items.keys())
+        if items:
+            self._expiries = np.fromiter(
+                (item["expiry_ts"] for item in items.values()), dtype=np.int64, count=len(items)
+            )
+        else:
+            self._expiries = np.empty(0, dtype=np.int64)
+
+    def _expiry_days(self, now: datetime) -> np.ndarray:
+        """向量化计算所有物品的剩余天数（与timedelta.days一致向下取整）"""
+        if len(self._expiries) == 0:
+            return np.empty(0, dtype=int)
+        delta = self._expiries - now.timestamp()
+        return np.floor(delta / 86400.0).astype(int)
+
+    def _build_occupancy(self) -> np.ndarray:
+        """从level_usage构建内存占用位图"""
+        occupancy = np.zeros((self.total_levels, self.sections_per_level), dtype=bool)
+        for level_str, sections in self.fridge_data.get("level_usage", {}).items():
+            for section_str, used in sections.items():
+                occupancy[int(level_str), int(section_str)] = bool(used)
+        return occupancy
+
+    def _build_slots(self) -> np.ndarray:
+        """从items构建槽位数组和item_id→(层,扇区)正向索引"""
+        slots = np.full((self.total_levels, self.sections_per_level), None, dtype=object)
+        self._item_index = {}
+        for item_id, item in self.fridge_data["items"].items():
+            level, section = item["level"], item["section"]
+            self._item_index[item_id] = (level, section)
+            if 0 <= level < self.total_levels and 0 <= section < self.sections_per_level:
+                slots[level, section] = item_id
+        return slots
+
     def _initialize_level_usage(self) -> Dict:
-        """初始化层级使用情况"""
-        level_usage = {}
-        for level in range(self.total_levels):
-            level_usage[str(level)] = {}
-            for section in range(self.sections_per_level):
-                level_usage[str(level)][str(section)] = False
-        return level_usage
+        """初始化层级使用情况（字符串键只存在于序列化形式中）"""
+        return {
+            str(level): {str(section): False for section in range(self.sections_per_level)}
+            for level in range(self.total_levels)
+        }
     
     def initialize_fridge_data(self) -> Dict:
         """初始化冰箱数据"""
@@ -967,16 +1367,169 @@ class AIProcessor:
         
         return data
     
-    def save_fridge_data(self):
-        """保存冰箱数据"""
+    def _replay_wal(self):
+        """启动时把WAL中的增删操作重放到最后一次快照上"""
+        if not os.path.exists(self._wal_path):
+            return
+        replayed = 0
         try:
+            with open(self._wal_path, 'rb') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    replayed += 1
+                    op = orjson.loads(line)
+                    if op["op"] == "add":
+                        item = op["item"]
+                        self.fridge_data["items"][op["id"]] = item
+                        self.fridge_data["level_usage"][str(item["level"])][str(item["section"])] = True
+                    elif op["op"] == "remove":
+                        item = self.fridge_data["items"].pop(op["id"], None)
+                        if item is not None:
+                            self.fridge_data["level_usage"][str(item["level"])][str(item["section"])] = False
+            logger.info("WAL重放完成")
+        except Exception as e:
+            logger.error("WAL重放失败: %s", e)
+        # 把现存日志整体计入累计量，让随后的快照把它当作前缀截掉。
+        # 快照本身等锁、位图和保存线程池都建好后在__init__末尾统一做，
+        # 这里还没到能调save_fridge_data的时候
+        try:
+            self._wal_bytes = os.path.getsize(self._wal_path)
+        except OSError:
+            self._wal_bytes = 0
+        self._wal_count = replayed
+        self._wal_appended_count = replayed
+        self._wal_appended_bytes = self._wal_bytes
+
+    def _log_mutation(self, op: Dict):
+        """把一次增删操作追加到WAL（单行orjson），代替全量重写"""
+        self.version += 1  # 调用方持有_data_lock，递增是安全的
+        try:
+            with self._wal_lock:
+                if self._wal_defer_depth > 0:
+                    # 批量区间内先攒着，退出时一次写入
+                    self._wal_buffer.append(orjson.dumps(op) + b'\n')
+                    return
+                line = orjson.dumps(op) + b'\n'
+                with open(self._wal_path, 'ab') as f:
+                    f.write(line)
+                self._wal_count += 1
+                self._wal_bytes += len(line)
+                self._wal_appended_count += 1
+                self._wal_appended_bytes += len(line)
+                need_compact = (self._wal_count >= self._wal_compact_every
+                                or self._wal_bytes >= self._wal_max_bytes)
+            if need_compact:
+                self.save_fridge_data()
+        except Exception as e:
+            logger.error("写入变更日志失败: %s", e)
+            # 日志写不进去就退回全量保存，保证数据不丢
+            self.save_fridge_data()
+
+    @contextmanager
+    def deferred_persistence(self):
+        """批量增删的事务区间：N条WAL追加合并成一次写盘"""
+        with self._wal_lock:
+            self._wal_defer_depth += 1
+        try:
+            yield
+        finally:
+            need_compact = False
+            with self._wal_lock:
+                self._wal_defer_depth -= 1
+                if self._wal_defer_depth == 0 and self._wal_buffer:
+                    try:
+                        payload = b''.join(self._wal_buffer)
+                        with open(self._wal_path, 'ab') as f:
+                            f.write(payload)
+                        self._wal_count += len(self._wal_buffer)
+                        self._wal_bytes += len(payload)
+                        self._wal_appended_count += len(self._wal_buffer)
+                        self._wal_appended_bytes += len(payload)
+                        need_compact = (self._wal_count >= self._wal_compact_every
+                                        or self._wal_bytes >= self._wal_max_bytes)
+                    except Exception as e:
+                        logger.error("批量写入变更日志失败: %s", e)
+                        need_compact = True  # 退回全量保存兜底
+                    self._wal_buffer.clear()
+            if need_compact:
+                self.save_fridge_data()
+
+    def _compact_wal(self):
+        """进程退出前做一次全量快照，把WAL压缩掉
+        atexit阶段解释器已抢先关停所有线程池，submit会直接抛
+        RuntimeError，所以这里绕过保存线程池在当前线程同步写盘"""
+        if self._wal_count == 0:
+            return
+        try:
+            snapshot, wal_mark = self._serialize_snapshot()
+            self._write_fridge_data(snapshot, wal_mark)
+        except Exception as e:
+            logger.error("退出前压缩WAL失败: %s", e)
+
+    def _serialize_snapshot(self) -> Tuple[bytes, Tuple[int, int]]:
+        """在数据锁内序列化全量快照，并记下序列化时刻WAL的累计量：
+        快照只覆盖到这里，之后追加的记录不能在写盘完成时被一并截掉"""
+        with self._data_lock:
             # 更新最后修改时间
             self.fridge_data["last_update"] = datetime.now().isoformat()
-            
-            with open(self.fridge_data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.fridge_data, f, ensure_ascii=False, indent=2)
+
+            # 将占用位图投影回可序列化的level_usage
+            self.fridge_data["level_usage"] = {
+                str(level): {
+                    str(section): bool(self._occupancy[level, section])
+                    for section in range(self.sections_per_level)
+                }
+                for level in range(self.total_levels)
+            }
+
+            snapshot = orjson.dumps(
+                self.fridge_data,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            )
+            with self._wal_lock:
+                wal_mark = (self._wal_appended_count, self._wal_appended_bytes)
+        return snapshot, wal_mark
+
+    def save_fridge_data(self):
+        """保存冰箱数据（全量快照，成功后清掉WAL里被覆盖的前缀）"""
+        try:
+            # 在调用方线程序列化快照，写盘交给后台线程
+            snapshot, wal_mark = self._serialize_snapshot()
+            self._save_pool.submit(self._write_fridge_data, snapshot, wal_mark)
+        except Exception as e:
+            logger.error("保存冰箱数据失败: %s", e)
+
+    def _write_fridge_data(self, data: bytes, wal_mark: Tuple[int, int]):
+        """原子写入冰箱数据（先写临时文件再替换），成功后截掉快照覆盖的WAL前缀"""
+        mark_count, mark_bytes = wal_mark
+        try:
+            tmp_path = self.fridge_data_file + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.fridge_data_file)
+            # 只截掉序列化时刻之前的日志前缀：之后追加的记录
+            # 没进这份快照，崩溃恢复时仍要靠它们重放
+            with self._wal_lock:
+                prefix = mark_bytes - self._wal_trimmed_bytes
+                if prefix <= 0:
+                    return  # 更新的快照已经截过这段前缀
+                if self._wal_appended_bytes == mark_bytes:
+                    open(self._wal_path, 'wb').close()
+                else:
+                    with open(self._wal_path, 'r+b') as f:
+                        f.seek(prefix)
+                        tail = f.read()
+                        f.seek(0)
+                        f.write(tail)
+                        f.truncate()
+                self._wal_trimmed_count = mark_count
+                self._wal_trimmed_bytes = mark_bytes
+                self._wal_count = self._wal_appended_count - mark_count
+                self._wal_bytes = self._wal_appended_bytes - mark_bytes
         except Exception as e:
-            logger.error(f"保存冰箱数据失败: {e}")
+            logger.error("写入冰箱数据失败: %s", e)
 
 # 全局AI处理器实例
 ai_processor = AIProcessor() 
\ No newline at end of file
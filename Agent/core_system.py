@@ -8,6 +8,7 @@
 import logging
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional, Callable
 from dataclasses import dataclass
@@ -43,10 +44,16 @@ class CoreSystem:
     """核心系统调度器"""
     
     def __init__(self):
-        self.event_handlers: Dict[EventType, List[Callable]] = {}
+        # 处理器表存不可变tuple，注册时整体替换（copy-on-write），分发无需加锁
+        self.event_handlers: Dict[EventType, tuple] = {}
+        # 通配处理器：想收全部事件的回调单独存一份，
+        # 注册O(1)，分发时也只多走一个条目，不必按每种类型重复挂
+        self._wildcard_handlers: tuple = ()
         self.running = False
-        self.event_queue = []
         self.event_lock = threading.Lock()
+
+        # 事件处理工作线程池：复用线程，突发事件不再每个都新建线程
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="evt")
         
         # 系统状态
         self.system_status = {
@@ -62,44 +69,53 @@ class CoreSystem:
     def _init_event_handlers(self):
         """初始化事件处理器"""
         for event_type in EventType:
-            self.event_handlers[event_type] = []
+            self.event_handlers[event_type] = ()
     
     def register_event_handler(self, event_type: EventType, handler: Callable):
         """注册事件处理器"""
-        if event_type not in self.event_handlers:
-            self.event_handlers[event_type] = []
-        self.event_handlers[event_type].append(handler)
-        logger.info(f"注册事件处理器: {event_type.value} -> {handler.__name__}")
+        self.event_handlers[event_type] = self.event_handlers.get(event_type, ()) + (handler,)
+        logger.info("注册事件处理器: %s -> %s", event_type.value, handler.__name__)
+    
+    def register_wildcard_handler(self, handler: Callable):
+        """注册通配事件处理器（任何类型的事件都会回调）"""
+        self._wildcard_handlers = self._wildcard_handlers + (handler,)
+        logger.info("注册通配事件处理器: %s", handler.__name__)
+    
+    def unregister_wildcard_handler(self, handler: Callable):
+        """注销通配事件处理器"""
+        if handler in self._wildcard_handlers:
+            self._wildcard_handlers = tuple(h for h in self._wildcard_handlers if h is not handler)
+            logger.info("注销通配事件处理器: %s", handler.__name__)
     
     def unregister_event_handler(self, event_type: EventType, handler: Callable):
         """注销事件处理器"""
-        if event_type in self.event_handlers and handler in self.event_handlers[event_type]:
-            self.event_handlers[event_type].remove(handler)
-            logger.info(f"注销事件处理器: {event_type.value} -> {handler.__name__}")
+        handlers = self.event_handlers.get(event_type, ())
+        if handler in handlers:
+            self.event_handlers[event_type] = tuple(h for h in handlers if h is not handler)
+            logger.info("注销事件处理器: %s -> %s", event_type.value, handler.__name__)
     
     def emit_event(self, event: SystemEvent):
         """发送系统事件"""
         with self.event_lock:
-            self.event_queue.append(event)
             self.system_status["last_event"] = event
         
-        logger.info(f"发送事件: {event.event_type.value} from {event.source}")
+        logger.info("发送事件: %s from %s", event.event_type.value, event.source)
         
-        # 异步处理事件
-        threading.Thread(target=self._process_event, args=(event,), daemon=True).start()
+        # 异步处理事件（提交到工作线程池）
+        self._executor.submit(self._process_event, event)
     
     def _process_event(self, event: SystemEvent):
         """处理系统事件"""
         try:
-            handlers = self.event_handlers.get(event.event_type, [])
+            handlers = self.event_handlers.get(event.event_type, ()) + self._wildcard_handlers
             for handler in handlers:
                 try:
                     handler(event)
                 except Exception as e:
-                    logger.error(f"事件处理器出错: {handler.__name__} -> {e}")
+                    logger.error("事件处理器出错: %s -> %s", handler.__name__, e)
                     self.system_status["error_count"] += 1
         except Exception as e:
-            logger.error(f"事件处理出错: {e}")
+            logger.error("事件处理出错: %s", e)
     
     def start(self):
         """启动核心系统"""
@@ -115,6 +131,7 @@ class CoreSystem:
         """停止核心系统"""
         self.running = False
         self.system_status["running"] = False
+        self._executor.shutdown(wait=False)
         logger.info("核心系统已停止")
     
     def get_status(self) -> Dict:
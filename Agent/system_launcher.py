@@ -5,7 +5,10 @@
 统一启动和管理所有模块
 """
 
+import atexit
 import logging
+import logging.handlers
+import queue
 import threading
 import time
 import signal
@@ -31,14 +34,22 @@ except ImportError as e:
     HARDWARE_AVAILABLE = False
     hardware_manager = None
 
-# 配置日志
+# 配置日志：文件/控制台写入放到QueueListener后台线程，
+# 业务线程记日志只是往队列里放一条记录，不被磁盘IO阻塞
+os.makedirs('logs', exist_ok=True)
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(
+    _log_queue,
+    logging.FileHandler('logs/system.log'),
+    logging.StreamHandler(),
+    respect_handler_level=True
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/system.log'),
-        logging.StreamHandler()
-    ]
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 
@@ -49,6 +60,8 @@ class SystemLauncher:
         self.running = False
         self.modules = {}
         self.threads = {}
+        # 关闭信号：监控线程和主循环等在这个事件上，shutdown时立即醒来
+        self._stop_evt = threading.Event()
         
         # 确保日志目录存在
         os.makedirs('logs', exist_ok=True)
@@ -59,7 +72,7 @@ class SystemLauncher:
     
     def _signal_handler(self, signum, frame):
         """信号处理器"""
-        logger.info(f"收到信号 {signum}，正在关闭系统...")
+        logger.info("收到信号 %s，正在关闭系统...", signum)
         self.shutdown()
         sys.exit(0)
     
@@ -91,14 +104,14 @@ class SystemLauncher:
                     hardware_manager.start_face_detection_monitor()
                     logger.info("✅ 人脸检测监控已启动")
                 except Exception as e:
-                    logger.warning(f"人脸检测监控启动失败: {e}")
+                    logger.warning("人脸检测监控启动失败: %s", e)
             else:
                 logger.warning("⚠️ 硬件管理器不可用，将使用模拟模式")
             
             logger.info("✅ 所有模块初始化完成")
             
         except Exception as e:
-            logger.error(f"模块初始化失败: {e}")
+            logger.error("模块初始化失败: %s", e)
             raise
     
     def start_web_server(self):
@@ -116,7 +129,7 @@ class SystemLauncher:
             logger.info("✅ Web服务器已启动: http://localhost:8080")
             
         except Exception as e:
-            logger.error(f"Web服务器启动失败: {e}")
+            logger.error("Web服务器启动失败: %s", e)
             raise
     
     def start_hardware_monitoring(self):
@@ -132,7 +145,7 @@ class SystemLauncher:
             logger.info("✅ 硬件监控已启动")
             
         except Exception as e:
-            logger.error(f"硬件监控启动失败: {e}")
+            logger.error("硬件监控启动失败: %s", e)
             raise
     
     def start_system_monitoring(self):
@@ -151,32 +164,39 @@ class SystemLauncher:
             logger.info("✅ 系统监控已启动")
             
         except Exception as e:
-            logger.error(f"系统监控启动失败: {e}")
+            logger.error("系统监控启动失败: %s", e)
             raise
     
     def _system_monitor_loop(self):
-        """系统监控循环"""
+        """系统监控循环（按截止时间唤醒，关闭信号立即退出）"""
+        next_health = time.monotonic()       # 模块健康检查：每10秒
+        next_status = time.monotonic() + 60  # 状态日志：每60秒
         while self.running:
             try:
-                # 检查系统状态
-                status = core_system.get_status()
-                
-                # 记录系统状态（每分钟一次）
-                if int(time.time()) % 60 == 0:
-                    logger.info(f"系统状态: {status}")
-                
+                now = time.monotonic()
+
+                # 状态日志到点才记录，不再用 time()%60 碰运气
+                if now >= next_status:
+                    logger.info("系统状态: %s", core_system.get_status())
+                    next_status = now + 60
+
                 # 检查各模块状态
-                for module_name, module in self.modules.items():
-                    if hasattr(module, 'get_status'):
-                        module_status = module.get_status()
-                        if module_status and not module_status.get('running', True):
-                            logger.warning(f"模块 {module_name} 状态异常")
-                
-                time.sleep(10)  # 每10秒检查一次
-                
+                if now >= next_health:
+                    for module_name, module in self.modules.items():
+                        if hasattr(module, 'get_status'):
+                            module_status = module.get_status()
+                            if module_status and not module_status.get('running', True):
+                                logger.warning("模块 %s 状态异常", module_name)
+                    next_health = now + 10
+
+                # 睡到最近的截止时间；shutdown置位事件时立即返回
+                wake = min(next_health, next_status) - time.monotonic()
+                if wake > 0:
+                    self._stop_evt.wait(wake)
+
             except Exception as e:
-                logger.error(f"系统监控出错: {e}")
-                time.sleep(30)  # 出错后等待30秒再重试
+                logger.error("系统监控出错: %s", e)
+                self._stop_evt.wait(30)  # 出错后等待30秒再重试
     
     def start(self):
         """启动整个系统"""
@@ -201,16 +221,17 @@ class SystemLauncher:
             logger.info("📱 Web界面: http://localhost:8080")
             logger.info("🔧 按 Ctrl+C 停止系统")
             
-            # 保持主线程运行
+            # 保持主线程运行：直接阻塞在关闭事件上，空闲时零唤醒
+            # （信号处理器和shutdown都会置位_stop_evt）
             try:
                 while self.running:
-                    time.sleep(1)
+                    self._stop_evt.wait()
             except KeyboardInterrupt:
                 logger.info("收到中断信号，正在关闭系统...")
                 self.shutdown()
             
         except Exception as e:
-            logger.error(f"系统启动失败: {e}")
+            logger.error("系统启动失败: %s", e)
             self.shutdown()
             raise
     
@@ -219,6 +240,7 @@ class SystemLauncher:
         try:
             logger.info("正在关闭系统...")
             self.running = False
+            self._stop_evt.set()  # 叫醒监控线程和主循环，不等下一次超时
             
             # 停止硬件管理器
             if HARDWARE_AVAILABLE and hardware_manager:
@@ -226,27 +248,27 @@ class SystemLauncher:
                     hardware_manager.cleanup()
                     logger.info("✅ 硬件管理器已关闭")
                 except Exception as e:
-                    logger.error(f"关闭硬件管理器失败: {e}")
+                    logger.error("关闭硬件管理器失败: %s", e)
             
             # 停止核心系统
             try:
                 core_system.stop()
                 logger.info("✅ 核心系统已关闭")
             except Exception as e:
-                logger.error(f"关闭核心系统失败: {e}")
+                logger.error("关闭核心系统失败: %s", e)
             
             # 等待线程结束
             for thread_name, thread in self.threads.items():
                 if thread.is_alive():
-                    logger.info(f"等待线程 {thread_name} 结束...")
+                    logger.info("等待线程 %s 结束...", thread_name)
                     thread.join(timeout=5)
                     if thread.is_alive():
-                        logger.warning(f"线程 {thread_name} 未能正常结束")
+                        logger.warning("线程 %s 未能正常结束", thread_name)
             
             logger.info("✅ 系统已完全关闭")
             
         except Exception as e:
-            logger.error(f"系统关闭过程中出错: {e}")
+            logger.error("系统关闭过程中出错: %s", e)
     
     def get_system_status(self) -> Dict:
         """获取系统状态"""
@@ -282,7 +304,7 @@ def main():
     except KeyboardInterrupt:
         logger.info("用户中断，正在关闭系统...")
     except Exception as e:
-        logger.error(f"系统运行出错: {e}")
+        logger.error("系统运行出错: %s", e)
     finally:
         launcher.shutdown()
 
@@ -7,17 +7,24 @@ Web服务管理器
 
 from flask import Flask, render_template, jsonify, request, Response, send_from_directory
 import json
+import orjson
 import os
 import logging
 import threading
 import time
+import itertools
+import weakref
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List, Set
-from queue import Queue, Empty
+from queue import Queue, Empty, SimpleQueue
 
 # 添加路径以便导入核心系统
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
 from core_system import core_system, EventType, SystemEvent
 from ai_processor import ai_processor
 
@@ -28,108 +35,183 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 过期进度条分档表：(剩余天数上限, 状态, 颜色, 百分比下限)
+# 状态/颜色这些静态部分查表取得，每次调用只需计算百分比和文案
+_EXPIRY_BUCKETS = (
+    (1, "expiring_soon", "orange", 5),
+    (3, "expiring_soon", "yellow", 10),
+    (5, "fresh", "blue", 30),
+    (float("inf"), "fresh", "green", 60),
+)
+_EXPIRY_UNKNOWN = {"percentage": 0, "status": "unknown", "color": "gray", "text": "未知"}
+
+
+def _sse_frame(obj: Dict) -> bytes:
+    """构建SSE数据帧字节（orjson直接产出bytes，广播时一帧发给所有客户端）"""
+    return b"data: " + orjson.dumps(obj) + b"\n\n"
+
+# 食物emoji映射（运行期不变，查询结果可安全记忆化）
+# 键在导入期intern：字典探测先走指针相等，未命中才逐字符比较
+_FOOD_EMOJIS = {sys.intern(k): v for k, v in {
+    "苹果": "🍎", "香蕉": "🍌", "橙子": "🍊", "草莓": "🍓", "葡萄": "🍇",
+    "西瓜": "🍉", "牛奶": "🥛", "酸奶": "🥛", "奶酪": "🧀", "鸡蛋": "🥚",
+    "面包": "🍞", "三明治": "🥪", "肉类": "🥩", "鱼类": "🐟", "蔬菜": "🥬",
+    "胡萝卜": "🥕", "番茄": "🍅", "洋葱": "🧅", "土豆": "🥔", "青椒": "🫑",
+    "黄瓜": "🥒", "生菜": "🥬", "冰淇淋": "🍦", "饺子": "🥟", "汤圆": "🥟",
+    "橙汁": "🧃", "可乐": "🥤", "啤酒": "🍺", "巧克力": "🍫", "黄油": "🧈",
+    "小提琴": "🎻", "乐器": "🎻", "熟食": "🍱", "水果": "🍎", "乳制品": "🥛",
+    "蛋类": "🥚", "海鲜": "🐟", "饮料": "🥤", "零食": "🍿", "冷冻食品": "🧊",
+    "其他": "📦"
+}.items()}
+_DEFAULT_EMOJI = _FOOD_EMOJIS["其他"]
+
+
+@lru_cache(maxsize=512)
+def _food_emoji(food_name: str, category: str) -> str:
+    """按(名称,类别)记忆化的emoji查找：名称优先，类别兜底，最多两次探测"""
+    e = _FOOD_EMOJIS.get(food_name)
+    return e if e is not None else _FOOD_EMOJIS.get(category, _DEFAULT_EMOJI)
+
+
+# 冰箱布局常量：2层×6扇区；序列化用的字符串键只生成一次
+_FRIDGE_LEVELS = 2
+_FRIDGE_SECTIONS = 6
+_SECTION_KEYS = tuple(str(j) for j in range(_FRIDGE_SECTIONS))
+# 各层实际温度（接口里的字符串键格式），运行期不变
+_TEMPERATURE_LEVELS = {"0": -5, "1": 4}
+
+# 按小时直接索引的问候语和建议表：0-5点按晚上、6-11早上、12-17下午、18-23晚上
+_night = ("晚上好！", "注意检查过期食物")
+_morning = ("早上好！", "建议食用新鲜水果补充维生素")
+_afternoon = ("下午好！", "下午茶时间，可以享用冰箱里的新鲜食物")
+_GREETINGS = (_night,) * 6 + (_morning,) * 6 + (_afternoon,) * 6 + (_night,) * 6
+del _night, _morning, _afternoon
+
+
+def _greeting_for_hour(hour: int):
+    """按小时取问候语（24项表直接索引，无分支）"""
+    return _GREETINGS[hour]
+
+
+# SSE事件名常量：sys.intern保证同一对象，通知线程里的比较走指针相等的快路径
+_EV_ITEM_PLACED = sys.intern("item_placed")
+_EV_ITEM_TAKEN = sys.intern("item_taken")
+_EV_PROXIMITY = sys.intern("proximity_sensor")
+_EV_CONNECTED = sys.intern("connected")
+_EV_HEARTBEAT = sys.intern("heartbeat")
+
+# 各层温度信息：按层号索引的固定表，越界返回未知档
+_TEMP_TABLE = (
+    {"temp": -5, "name": "冷冻", "emoji": "🧊"},
+    {"temp": 4, "name": "冷藏", "emoji": "❄️"},
+)
+_TEMP_UNKNOWN = {"temp": 0, "name": "未知", "emoji": "❓"}
+
 class WebManager:
     """Web服务管理器"""
     
     def __init__(self):
         self.app = Flask(__name__)
-        self.sse_clients: Dict[str, Queue] = {}
+        # SSE客户端注册表：弱引用值，生成器一死（正常断开或被GC）条目自动消失，
+        # 不会因为清理逻辑没跑到而泄漏队列；ID用递增整数，比拼时间戳字符串便宜
+        self.sse_clients: "weakref.WeakValueDictionary[int, Queue]" = weakref.WeakValueDictionary()
+        self._sse_ids = itertools.count(1)
         self.sse_lock = threading.Lock()
+
+        # 按库存版本号缓存的接口响应字节：endpoint -> (版本, 生成时刻, body)
+        # 版本不变轮询直接回放，增删后版本号变了自然失效；
+        # 剩余天数随时间推移会变，额外给个短TTL兜底
+        self._resp_cache: Dict[str, tuple] = {}
+        self._resp_cache_ttl = 30.0
+        self._resp_cache_lock = threading.Lock()
         
-        # 食物emoji映射
-        self.FOOD_EMOJIS = {
-            "苹果": "🍎", "香蕉": "🍌", "橙子": "🍊", "草莓": "🍓", "葡萄": "🍇",
-            "西瓜": "🍉", "牛奶": "🥛", "酸奶": "🥛", "奶酪": "🧀", "鸡蛋": "🥚",
-            "面包": "🍞", "三明治": "🥪", "肉类": "🥩", "鱼类": "🐟", "蔬菜": "🥬",
-            "胡萝卜": "🥕", "番茄": "🍅", "洋葱": "🧅", "土豆": "🥔", "青椒": "🫑",
-            "黄瓜": "🥒", "生菜": "🥬", "冰淇淋": "🍦", "饺子": "🥟", "汤圆": "🥟",
-            "橙汁": "🧃", "可乐": "🥤", "啤酒": "🍺", "巧克力": "🍫", "黄油": "🧈",
-            "小提琴": "🎻", "乐器": "🎻", "熟食": "🍱", "水果": "🍎", "乳制品": "🥛",
-            "蛋类": "🥚", "海鲜": "🐟", "饮料": "🥤", "零食": "🍿", "冷冻食品": "🧊",
-            "其他": "📦"
-        }
+        # 食物emoji映射（表在模块级，这里保留引用兼容旧用法）
+        self.FOOD_EMOJIS = _FOOD_EMOJIS
         
+        # 事件通知队列：系统事件处理器只入队，格式化/日志/SSE广播由专职线程完成
+        self._evq = SimpleQueue()
+        self._ev_worker = threading.Thread(target=self._event_worker_loop, daemon=True)
+        self._ev_worker.start()
+
         # 注册事件处理器
         self._register_event_handlers()
         
         # 设置路由
         self._setup_routes()
     
+    # 事件类型到SSE事件名的映射
+    _EVENT_DISPATCH = {
+        EventType.ITEM_PLACED: _EV_ITEM_PLACED,
+        EventType.ITEM_TAKEN: _EV_ITEM_TAKEN,
+        EventType.PROXIMITY_SENSOR: _EV_PROXIMITY,
+    }
+
     def _register_event_handlers(self):
-        """注册事件处理器"""
-        core_system.register_event_handler(EventType.ITEM_PLACED, self._handle_item_placed)
-        core_system.register_event_handler(EventType.ITEM_TAKEN, self._handle_item_taken)
-        core_system.register_event_handler(EventType.PROXIMITY_SENSOR, self._handle_proximity_sensor)
+        """注册事件处理器（统一入口按表分发）"""
+        for event_type in self._EVENT_DISPATCH:
+            core_system.register_event_handler(event_type, self._handle_system_event)
         logger.info("Web管理器事件处理器注册完成")
-    
-    def _handle_item_placed(self, event: SystemEvent):
-        """处理物品放置事件"""
-        try:
-            data = event.data
-            message = f"✅ 物品已放置: {data.get('item_name')} (第{data.get('temperature_level')}层)"
-            
-            # 发送SSE通知
-            self.notify_sse_clients("item_placed", {
-                "message": message,
-                "item_name": data.get("item_name"),
-                "category": data.get("category"),
-                "temperature_level": data.get("temperature_level")
-            })
-            
-            logger.info(message)
-            
-        except Exception as e:
-            logger.error(f"处理物品放置事件失败: {e}")
-    
-    def _handle_item_taken(self, event: SystemEvent):
-        """处理物品取出事件"""
-        try:
-            data = event.data
-            message = f"📤 物品已取出: {data.get('item_name')} ({data.get('reason')})"
-            
-            # 发送SSE通知
-            self.notify_sse_clients("item_taken", {
-                "message": message,
-                "item_name": data.get("item_name"),
-                "category": data.get("category"),
-                "reason": data.get("reason")
-            })
-            
-            logger.info(message)
-            
-        except Exception as e:
-            logger.error(f"处理物品取出事件失败: {e}")
-    
-    def _handle_proximity_sensor(self, event: SystemEvent):
-        """处理接近传感器事件"""
-        try:
-            data = event.data
-            current_time = datetime.now()
-            hour = current_time.hour
-            
-            if 6 <= hour < 12:
-                greeting = "早上好！"
-                recommendation = "建议食用新鲜水果补充维生素"
-            elif 12 <= hour < 18:
-                greeting = "下午好！"
-                recommendation = "下午茶时间，可以享用冰箱里的新鲜食物"
-            else:
-                greeting = "晚上好！"
-                recommendation = "注意检查过期食物"
-            
-            message = f"👤 {greeting} {recommendation}"
-            
-            # 发送SSE通知
-            self.notify_sse_clients("proximity_sensor", {
-                "message": message,
-                "greeting": greeting,
-                "recommendation": recommendation
-            })
-            
-            logger.info(message)
-            
-        except Exception as e:
-            logger.error(f"处理接近传感器事件失败: {e}")
+
+    def _cached_response(self, endpoint: str, version: int):
+        """按(接口,库存版本)取缓存的响应字节，版本不符或超TTL返回None"""
+        with self._resp_cache_lock:
+            entry = self._resp_cache.get(endpoint)
+            if entry is None:
+                return None
+            cached_version, built_at, body = entry
+            if cached_version != version or time.monotonic() - built_at > self._resp_cache_ttl:
+                del self._resp_cache[endpoint]
+                return None
+            return body
+
+    def _store_response(self, endpoint: str, version: int, body: bytes):
+        """缓存一份序列化好的响应字节"""
+        with self._resp_cache_lock:
+            self._resp_cache[endpoint] = (version, time.monotonic(), body)
+
+    def _handle_system_event(self, event: SystemEvent):
+        """统一事件处理器：查表分发，只入队，耗时工作交给通知线程"""
+        # 响应缓存按库存版本号校验，增删后自动失效，这里不需要手动作废
+        # 无条件入队：即使没有SSE客户端，事件日志也要照常落下，
+        # 通知线程只在真正广播时才检查有没有人在听
+        self._evq.put((self._EVENT_DISPATCH[event.event_type], event.data))
+
+    def _event_worker_loop(self):
+        """通知线程：串行消费事件队列，做格式化、日志和SSE广播"""
+        while True:
+            kind, data = self._evq.get()
+            try:
+                if kind is _EV_ITEM_PLACED:
+                    message = f"✅ 物品已放置: {data.get('item_name')} (第{data.get('temperature_level')}层)"
+                    self.notify_sse_clients(_EV_ITEM_PLACED, {
+                        "message": message,
+                        "item_name": data.get("item_name"),
+                        "category": data.get("category"),
+                        "temperature_level": data.get("temperature_level")
+                    })
+                elif kind is _EV_ITEM_TAKEN:
+                    message = f"📤 物品已取出: {data.get('item_name')} ({data.get('reason')})"
+                    self.notify_sse_clients(_EV_ITEM_TAKEN, {
+                        "message": message,
+                        "item_name": data.get("item_name"),
+                        "category": data.get("category"),
+                        "reason": data.get("reason")
+                    })
+                elif kind is _EV_PROXIMITY:
+                    greeting, recommendation = _greeting_for_hour(datetime.now().hour)
+                    message = f"👤 {greeting} {recommendation}"
+                    self.notify_sse_clients(_EV_PROXIMITY, {
+                        "message": message,
+                        "greeting": greeting,
+                        "recommendation": recommendation
+                    })
+                else:
+                    continue
+                
+                logger.info(message)
+                
+            except Exception as e:
+                logger.error("处理%s事件失败: %s", kind, e)
     
     def _setup_routes(self):
         """设置Web路由"""
@@ -153,16 +235,21 @@ class WebManager:
         def get_fridge_status():
             """获取冰箱状态API"""
             try:
+                # 库存版本没变的轮询直接回放上次序列化好的字节
+                version = ai_processor.version
+                cached = self._cached_response("fridge-status", version)
+                if cached is not None:
+                    return Response(cached, mimetype='application/json')
+
                 # 获取冰箱库存
                 inventory_result = ai_processor.get_fridge_inventory()
                 
                 if not inventory_result["success"]:
                     return jsonify({"error": "获取库存失败"})
                 
-                # 处理库存数据
+                # 处理库存数据（占用先记在bool网格里，最后一次性投影成接口格式）
                 items = []
-                level_usage = {str(i): {str(j): False for j in range(6)} for i in range(2)}
-                temperature_levels = {str(0): -5, str(1): 4}  # 实际温度数据
+                occupied = np.zeros((_FRIDGE_LEVELS, _FRIDGE_SECTIONS), dtype=bool)
                 
                 # 统计数据
                 stats = {
@@ -173,11 +260,17 @@ class WebManager:
                     "expired_items": 0
                 }
                 
+                # 整个请求取一次时间；剩余天数直接用epoch整数算，不逐条解析ISO
+                now = datetime.now()
+                now_ts = now.timestamp()
+
                 for item in inventory_result["inventory"]:
                     emoji = self.get_food_emoji(item["name"], item["category"])
-                    expiry_progress = self.calculate_expiry_progress(
-                        ai_processor.fridge_data["items"][item["item_id"]]["expiry_date"]
-                    )
+                    expiry_ts = item.get("expiry_ts")
+                    if expiry_ts is not None:
+                        expiry_progress = self.calculate_expiry_progress(int((expiry_ts - now_ts) // 86400))
+                    else:
+                        expiry_progress = self.calculate_expiry_progress(item.get("expiry_date", ""), now=now)
                     temp_info = self.get_temperature_info(item["level"])
                     
                     # 更新统计
@@ -192,7 +285,7 @@ class WebManager:
                         stats["expired_items"] += 1
                     
                     # 更新层级使用情况
-                    level_usage[str(item["level"])][str(item["section"])] = True
+                    occupied[item["level"], item["section"]] = True
                     
                     items.append({
                         "id": item["item_id"],
@@ -206,23 +299,35 @@ class WebManager:
                         "added_date": item["added_date"]
                     })
                 
-                return jsonify({
+                level_usage = {
+                    str(i): dict(zip(_SECTION_KEYS, row))
+                    for i, row in enumerate(occupied.tolist())
+                }
+
+                body = orjson.dumps({
                     "success": True,
                     "items": items,
                     "stats": stats,
                     "level_usage": level_usage,
-                    "temperature_levels": temperature_levels,
+                    "temperature_levels": _TEMPERATURE_LEVELS,
                     "total_items": len(items)
                 })
+                self._store_response("fridge-status", version, body)
+                return Response(body, mimetype='application/json')
                 
             except Exception as e:
-                logger.error(f"获取冰箱状态失败: {e}")
+                logger.error("获取冰箱状态失败: %s", e)
                 return jsonify({"error": str(e)})
         
         @self.app.route('/api/recommendations')
         def get_recommendations():
             """获取推荐API"""
             try:
+                version = ai_processor.version
+                cached = self._cached_response("recommendations", version)
+                if cached is not None:
+                    return Response(cached, mimetype='application/json')
+
                 recommendations = ai_processor.get_recommendations()
                 
                 if not recommendations["success"]:
@@ -240,30 +345,21 @@ class WebManager:
                     "summary": recommendations.get("summary", "")
                 }
                 
-                # 处理过期物品
+                # 处理过期/即将过期物品：这些dict由get_recommendations为本次
+                # 调用新建，原地补emoji即可，不必逐个splat复制
                 for item in recommendations.get("expired_items", []):
-                    emoji = self.get_food_emoji(item["name"], item["category"])
-                    processed_recommendations["expired_items"].append({
-                        **item,
-                        "emoji": emoji
-                    })
+                    item["emoji"] = self.get_food_emoji(item["name"], item["category"])
+                    processed_recommendations["expired_items"].append(item)
                 
-                # 处理即将过期物品
                 for item in recommendations.get("expiring_soon_items", []):
-                    emoji = self.get_food_emoji(item["name"], item["category"])
-                    processed_recommendations["expiring_soon_items"].append({
-                        **item,
-                        "emoji": emoji
-                    })
+                    item["emoji"] = self.get_food_emoji(item["name"], item["category"])
+                    processed_recommendations["expiring_soon_items"].append(item)
                 
                 # 处理推荐取出的物品
                 take_out_item = recommendations.get("take_out_item")
                 if take_out_item:
-                    emoji = self.get_food_emoji(take_out_item["name"], take_out_item["category"])
-                    processed_recommendations["take_out_item"] = {
-                        **take_out_item,
-                        "emoji": emoji
-                    }
+                    take_out_item["emoji"] = self.get_food_emoji(take_out_item["name"], take_out_item["category"])
+                    processed_recommendations["take_out_item"] = take_out_item
                 
                 # 处理AI推荐，为每个推荐中的物品添加emoji
                 for rec in processed_recommendations["ai_recommendations"]:
@@ -271,10 +367,12 @@ class WebManager:
                         if "emoji" not in item:
                             item["emoji"] = self.get_food_emoji(item["name"], item["category"])
                 
-                return jsonify(processed_recommendations)
+                body = orjson.dumps(processed_recommendations)
+                self._store_response("recommendations", version, body)
+                return Response(body, mimetype='application/json')
                 
             except Exception as e:
-                logger.error(f"获取推荐失败: {e}")
+                logger.error("获取推荐失败: %s", e)
                 return jsonify({"error": str(e)})
         
         @self.app.route('/api/physical-button', methods=['POST'])
@@ -321,7 +419,7 @@ class WebManager:
                     })
                     
             except Exception as e:
-                logger.error(f"处理物理按钮事件失败: {e}")
+                logger.error("处理物理按钮事件失败: %s", e)
                 return jsonify({"error": str(e)})
         
         @self.app.route('/api/take-item', methods=['POST'])
@@ -341,8 +439,8 @@ class WebManager:
                 result = ai_processor.get_item_from_fridge(item_id)
                 
                 if result["success"]:
-                    # 发送SSE通知
-                    self.notify_sse_clients("item_taken", {
+                    # 发送SSE通知（响应缓存按版本号自动失效）
+                    self.notify_sse_clients(_EV_ITEM_TAKEN, {
                         "item_name": result["item"]["name"],
                         "message": result["message"]
                     })
@@ -359,7 +457,7 @@ class WebManager:
                     })
                     
             except Exception as e:
-                logger.error(f"取出物品失败: {e}")
+                logger.error("取出物品失败: %s", e)
                 return jsonify({"error": str(e)})
         
         @self.app.route('/api/proximity-sensor', methods=['POST'])
@@ -370,18 +468,7 @@ class WebManager:
                 detected = data.get("detected", False)
                 
                 if detected:
-                    current_time = datetime.now()
-                    hour = current_time.hour
-                    
-                    if 6 <= hour < 12:
-                        greeting = "早上好！"
-                        recommendation = "建议食用新鲜水果补充维生素"
-                    elif 12 <= hour < 18:
-                        greeting = "下午好！"
-                        recommendation = "下午茶时间，可以享用冰箱里的新鲜食物"
-                    else:
-                        greeting = "晚上好！"
-                        recommendation = "注意检查过期食物"
+                    greeting, recommendation = _greeting_for_hour(datetime.now().hour)
                     
                     return jsonify({
                         "success": True,
@@ -398,19 +485,18 @@ class WebManager:
                     })
                     
             except Exception as e:
-                logger.error(f"处理接近传感器事件失败: {e}")
+                logger.error("处理接近传感器事件失败: %s", e)
                 return jsonify({"error": str(e)})
         
         @self.app.route('/api/events')
         def sse():
             """SSE事件流"""
             def generate():
-                # 生成客户端ID
-                client_id = f"client_{int(time.time())}_{threading.get_ident()}"
+                # 生成客户端ID（进程内递增整数即可）
+                client_id = next(self._sse_ids)
                 
-                # 为客户端创建消息队列
-                from queue import Queue
-                client_queue = Queue()
+                # 为客户端创建有界消息队列（慢客户端丢消息，不拖慢广播）
+                client_queue = Queue(maxsize=256)
                 
                 # 添加客户端
                 with self.sse_lock:
@@ -418,23 +504,21 @@ class WebManager:
                 
                 try:
                     # 发送连接确认
-                    yield f"data: {json.dumps({'type': 'connected', 'client_id': client_id})}\n\n"
+                    yield _sse_frame({'type': _EV_CONNECTED, 'client_id': client_id})
                     
-                    # 保持连接并发送消息
+                    # 保持连接并发送消息：有事件立即推送，空闲时15秒一次心跳
                     while True:
                         try:
-                            # 等待消息，最多等待1秒
-                            message = client_queue.get(timeout=1)
-                            yield f"data: {json.dumps(message)}\n\n"
+                            # 队列里已是编码好的帧字节，直接透传
+                            yield client_queue.get(timeout=15)
                         except Empty:
                             # 发送心跳
-                            yield f"data: {json.dumps({'type': 'heartbeat', 'timestamp': time.time()})}\n\n"
+                            yield _sse_frame({'type': _EV_HEARTBEAT, 'timestamp': time.time()})
                         
                 except GeneratorExit:
-                    # 客户端断开连接
+                    # 客户端断开连接：立即摘除（弱引用兜底覆盖close没被调用的情况）
                     with self.sse_lock:
-                        if client_id in self.sse_clients:
-                            del self.sse_clients[client_id]
+                        self.sse_clients.pop(client_id, None)
             
             return Response(generate(), mimetype='text/event-stream')
         
@@ -455,29 +539,24 @@ class WebManager:
                     "system_status": serializable_status
                 })
             except Exception as e:
-                logger.error(f"获取系统状态失败: {e}")
+                logger.error("获取系统状态失败: %s", e)
                 return jsonify({"error": str(e)})
     
     def get_food_emoji(self, food_name: str, category: str) -> str:
-        """获取食物的emoji"""
-        # 优先使用具体食物名称的emoji
-        if food_name in self.FOOD_EMOJIS:
-            return self.FOOD_EMOJIS[food_name]
-        
-        # 如果没有具体食物名称，使用类别emoji
-        if category in self.FOOD_EMOJIS:
-            return self.FOOD_EMOJIS[category]
-        
-        return self.FOOD_EMOJIS["其他"]
+        """获取食物的emoji（名称优先于类别，结果记忆化）"""
+        return _food_emoji(food_name, category)
     
-    def calculate_expiry_progress(self, expiry_date_str: str) -> Dict:
-        """计算过期进度条"""
+    def calculate_expiry_progress(self, expiry, now: datetime = None) -> Dict:
+        """计算过期进度条
+
+        expiry 可以是预先算好的剩余天数(int)，也可以是ISO过期时间字符串。
+        """
         try:
-            expiry_date = datetime.fromisoformat(expiry_date_str)
-            current_time = datetime.now()
-            
             # 计算剩余天数
-            remaining_days = (expiry_date - current_time).days
+            if isinstance(expiry, str):
+                remaining_days = (datetime.fromisoformat(expiry) - (now or datetime.now())).days
+            else:
+                remaining_days = int(expiry)
             
             # 检查是否为长期保存的物品
             if remaining_days > 10000:
@@ -498,90 +577,76 @@ class WebManager:
                     "color": "red",
                     "text": "已过期"
                 }
-            elif remaining_days <= 1:
-                percentage = max(5, (remaining_days / total_days) * 100)
-                return {
-                    "percentage": percentage,
-                    "status": "expiring_soon",
-                    "color": "orange",
-                    "text": f"剩余{remaining_days}天"
-                }
-            elif remaining_days <= 3:
-                percentage = max(10, (remaining_days / total_days) * 100)
-                return {
-                    "percentage": percentage,
-                    "status": "expiring_soon",
-                    "color": "yellow",
-                    "text": f"剩余{remaining_days}天"
-                }
-            elif remaining_days <= 5:
-                percentage = max(30, (remaining_days / total_days) * 100)
-                return {
-                    "percentage": percentage,
-                    "status": "fresh",
-                    "color": "blue",
-                    "text": f"剩余{remaining_days}天"
-                }
-            else:
-                percentage = max(60, (remaining_days / total_days) * 100)
-                return {
-                    "percentage": percentage,
-                    "status": "fresh",
-                    "color": "green",
-                    "text": f"剩余{remaining_days}天"
-                }
-        except:
+
+            # 其余档位查分档表，免去逐分支构造dict
+            for limit, status, color, pct_floor in _EXPIRY_BUCKETS:
+                if remaining_days <= limit:
+                    break
             return {
-                "percentage": 0,
-                "status": "unknown",
-                "color": "gray",
-                "text": "未知"
+                "percentage": max(pct_floor, (remaining_days / total_days) * 100),
+                "status": status,
+                "color": color,
+                "text": f"剩余{remaining_days}天"
             }
+        except:
+            return _EXPIRY_UNKNOWN
     
     def get_temperature_info(self, level: int) -> Dict:
-        """获取温度信息"""
-        temperature_levels = {
-            0: {"temp": -5, "name": "冷冻", "emoji": "🧊"},
-            1: {"temp": 4, "name": "冷藏", "emoji": "❄️"}
-        }
-        return temperature_levels.get(level, {"temp": 0, "name": "未知", "emoji": "❓"})
+        """获取温度信息（查模块级固定表）"""
+        if isinstance(level, int) and 0 <= level < len(_TEMP_TABLE):
+            return _TEMP_TABLE[level]
+        return _TEMP_UNKNOWN
     
     def notify_sse_clients(self, event_type: str, data: Dict):
         """通知SSE客户端"""
-        message = {
+        with self.sse_lock:
+            clients = list(self.sse_clients.items())
+
+        # 没有客户端就不编码帧，直接返回
+        if not clients:
+            return
+
+        # 帧只编码一次，所有客户端复用同一份字节
+        frame = _sse_frame({
             "type": event_type,
             "data": data,
             "timestamp": time.time()
-        }
-        
-        with self.sse_lock:
-            # 向所有客户端发送消息
-            for client_id, client_queue in self.sse_clients.items():
-                try:
-                    client_queue.put(message, timeout=0.1)
-                except:
-                    # 如果发送失败，移除该客户端
-                    try:
-                        del self.sse_clients[client_id]
-                    except:
-                        pass
-            
-            logger.info(f"SSE通知: {event_type} -> {len(self.sse_clients)} 个客户端")
+        })
+
+        # 锁外广播：put_nowait不阻塞，队列满说明客户端消费不动，丢这条消息
+        for client_id, client_queue in clients:
+            try:
+                client_queue.put_nowait(frame)
+            except Exception:
+                logger.warning("SSE客户端 %s 队列已满，丢弃消息 %s", client_id, event_type)
+
+        logger.info("SSE通知: %s -> %s 个客户端", event_type, len(clients))
     
+    def _serve(self, host: str, port: int, debug: bool = False):
+        """运行WSGI服务器：优先waitress，未安装时退回Flask开发服务器"""
+        if not debug:
+            try:
+                from waitress import serve
+                # SSE长连接各占一个线程，线程数给足；channel_timeout要盖过15秒心跳
+                serve(self.app, host=host, port=port, threads=16, channel_timeout=120)
+                return
+            except ImportError:
+                logger.warning("waitress未安装，退回Flask开发服务器")
+        self.app.run(host=host, port=port, debug=debug, threaded=True, use_reloader=False)
+
     def start(self, host: str = "0.0.0.0", port: int = 8080, debug: bool = False):
         """启动Web服务"""
-        logger.info(f"启动Web服务: http://{host}:{port}")
-        # 使用Flask的开发服务器，但设置为非阻塞模式
-        self.app.run(host=host, port=port, debug=debug, threaded=True, use_reloader=False)
+        logger.info("启动Web服务: http://%s:%s", host, port)
+        self._serve(host, port, debug)
     
     def start_in_thread(self, host: str = "0.0.0.0", port: int = 8080, debug: bool = False):
         """在后台线程中启动Web服务"""
         def run_server():
             try:
-                logger.info(f"Web服务器线程启动: http://{host}:{port}")
-                self.app.run(host=host, port=port, debug=False, threaded=True, use_reloader=False)
+                logger.info("Web服务器线程启动: http://%s:%s", host, port)
+                self._serve(host, port)
             except Exception as e:
-                logger.error(f"Web服务器启动失败: {e}")
+                logger.error("Web服务器启动失败: %s", e)
         
         # 创建并启动线程
         import threading
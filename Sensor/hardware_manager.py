@@ -5,22 +5,46 @@
 统一管理所有外设：按钮、摄像头等
 """
 
+import itertools
 import logging
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import cv2
+import numpy as np
 import RPi.GPIO as GPIO
 from typing import Dict, Optional, Callable
 from enum import Enum
 
-# 添加路径以便导入核心系统
+# 添加路径以便导入核心系统（防止重复导入时路径越append越长）
 import sys
 import os
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Agent'))
+_agent_dir = os.path.join(os.path.dirname(__file__), '..', 'Agent')
+if _agent_dir not in sys.path:
+    sys.path.append(_agent_dir)
 from core_system import core_system, EventType, SystemEvent
 
 logger = logging.getLogger(__name__)
 
+# 人脸距离判定核：numba可用时编译成机器码（除法+比较可SIMD化），
+# 否则退回NumPy向量化路径，行为一致
+try:
+    from numba import njit
+
+    @njit(cache=True, fastmath=True)
+    def _any_near(widths, ref_w, ref_d, thresh):
+        for w in widths:
+            if w > 0 and (ref_w * ref_d) / w <= thresh:
+                return True
+        return False
+
+    # 导入时用空输入触发一次编译，首帧不吃编译延迟
+    _any_near(np.zeros(1, dtype=np.float64), 1.0, 1.0, 1.0)
+except ImportError:
+    def _any_near(widths, ref_w, ref_d, thresh):
+        distances = (ref_w * ref_d) / np.maximum(widths, 1)
+        return bool(np.any(distances <= thresh))
+
 class ButtonType(Enum):
     """按钮类型枚举"""
     PLACE_ITEM = "place_item"  # 绿色按钮 - 放入物品
@@ -42,10 +66,23 @@ class HardwareManager:
         # 摄像头配置
         self.cameras: Dict[CameraType, Optional[cv2.VideoCapture]] = {}
         self.face_cascade = None
+        # GPU加速后端（_init_detection_backend探测后可能启用）
+        self.face_cascade_gpu = None
+        self._use_opencl = False
+        # 外部摄像头灰度直采模式：'GREY'/'YUYV'/None（None走cvtColor）
+        self._external_gray_mode = None
+        # 共享摄像头标志和分配到的设备索引：初始化时定死，热路径直接读
+        self._shared_camera = False
+        self._camera_indices: Dict[CameraType, Optional[int]] = {
+            CameraType.INTERNAL: None,
+            CameraType.EXTERNAL: None,
+        }
         
-        # 防抖配置
-        self.last_button_time = 0
-        self.button_cooldown = 0.5  # 0.5秒冷却时间
+        # 防抖配置：两个按键共用冷却窗口，读改写必须在锁内，
+        # 否则两路GPIO几乎同时触发时会双双通过检查
+        self._last_press_ns = 0
+        self._button_cooldown_ns = 500_000_000  # 0.5秒冷却时间
+        self._button_lock = threading.Lock()
         self.last_face_detection_time = 0
         self.face_detection_cooldown = 3.0  # 3秒冷却时间
         
@@ -53,10 +90,47 @@ class HardwareManager:
         self.REFERENCE_FACE_WIDTH = 150  # 像素
         self.REFERENCE_DISTANCE = 50  # 厘米
         self.DETECTION_DISTANCE = 50  # 检测距离阈值
+        # 检测前先把灰度图缩小一半：级联扫描的像素少4倍，Pi上CPU占用大幅下降
+        self.FACE_DETECT_SCALE = 0.5
+        # 级联搜索的人脸尺寸窗口（缩放后坐标系）：50cm处人脸~150px，
+        # 上界按约19cm的极近距离(~400px)取，再近的脸已经占满画面没有意义；
+        # 有了上界金字塔只评估有用的几层，而不是一路扫到整幅图
+        self._face_min_size = (15, 15)
+        self._face_max_size = (int(400 * self.FACE_DETECT_SCALE),) * 2
         
         # 运行状态
         self.running = False
         self.face_detection_thread = None
+        # 采集/检测流水线：采集线程不停读最新帧，检测线程取走后运行级联，
+        # 单槽覆盖写，检测永远处理最新画面（也就不需要grab冲刷缓冲）
+        self.capture_thread = None
+        self._frame_lock = threading.Lock()
+        self._latest_frame = None
+        # 新帧到达信号：检测线程等它，不再定时轮询
+        self._frame_ready = threading.Event()
+
+        # 复用的帧缓冲：read/cvtColor/resize都写进预分配数组，
+        # 省掉每帧几MB的分配和GC压力（首帧按实际分辨率惰性分配）
+        self._capture_buf = None
+        self._detect_frame_buf = None
+        self._gray_buf = None
+        self._small_buf = None
+
+        # 拍照IO线程池：JPEG编码和写盘在Pi上要50-200ms，
+        # 放后台做，按键回调拿到帧就能返回
+        self._io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="camio")
+
+        # 上传目录只建一次；文件名带递增序号，秒级时间戳连拍不会互相覆盖
+        self._uploads_dir = "uploads"
+        os.makedirs(self._uploads_dir, exist_ok=True)
+        self._capture_seq = itertools.count(1)
+
+        # 识别链路走事件里的内存字节，落盘只是留档/调试用，可用环境变量关掉
+        self._persist_captures = os.environ.get('FRIDGE_SAVE_CAPTURES', '1') != '0'
+
+        # 按键回调用的HTTP会话：首次用到时才导入requests并建连接，
+        # 之后复用长连接，回调里不再走一遍导入机制
+        self._http_session = None
         
         # 初始化硬件
         self._init_gpio()
@@ -70,9 +144,10 @@ class HardwareManager:
             GPIO.setup(self.GPIO_16, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
             GPIO.setup(self.GPIO_17, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
             
-            # 设置事件检测
-            GPIO.add_event_detect(self.GPIO_16, GPIO.RISING, callback=self._button16_callback, bouncetime=200)
-            GPIO.add_event_detect(self.GPIO_17, GPIO.RISING, callback=self._button17_callback, bouncetime=200)
+            # 设置事件检测：防抖只在Python侧做一层（_debounce），
+            # 不再叠加C扩展里的bouncetime定时器，冷却窗口也能纯Python调整
+            GPIO.add_event_detect(self.GPIO_16, GPIO.RISING, callback=self._button16_callback)
+            GPIO.add_event_detect(self.GPIO_17, GPIO.RISING, callback=self._button17_callback)
             
             logger.info("GPIO初始化成功")
         except Exception as e:
@@ -90,6 +165,11 @@ class HardwareManager:
                 try:
                     cam = cv2.VideoCapture(idx)
                     if cam.isOpened():
+                        # 显式请求MJPG 640x480：不设的话驱动常默认1080p YUYV，
+                        # USB2带宽被白白占满，级联也用不上那么多像素
+                        cam.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+                        cam.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+                        cam.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
                         # 测试读取一帧
                         ret, frame = cam.read()
                         if ret and frame is not None:
@@ -120,14 +200,27 @@ class HardwareManager:
                 
                 self.cameras[CameraType.INTERNAL] = internal_cam
                 self.cameras[CameraType.EXTERNAL] = external_cam
+                self._camera_indices[CameraType.INTERNAL] = internal_idx
+                self._camera_indices[CameraType.EXTERNAL] = external_idx
                 
                 logger.info(f"摄像头分配: 内部摄像头={internal_idx}, 外部摄像头={external_idx}")
                 
+                # 人脸检测15fps足够，独占的外部摄像头降帧率再省一截带宽
+                external_cam.set(cv2.CAP_PROP_FPS, 15)
+                # 人脸检测只用灰度图，外部摄像头独占时尝试让驱动直接给Y分量，
+                # 每帧省掉一次cvtColor和约2/3的内存搬运（共享摄像头不能动格式）
+                self._external_gray_mode = self._try_gray_capture(external_cam)
+                if self._external_gray_mode:
+                    logger.info(f"外部摄像头启用灰度直采模式: {self._external_gray_mode}")
+                
             else:
                 # 只有一个摄像头，共享使用
                 idx, cam = available_cameras[0]
                 self.cameras[CameraType.INTERNAL] = cam
                 self.cameras[CameraType.EXTERNAL] = cam
+                self._camera_indices[CameraType.INTERNAL] = idx
+                self._camera_indices[CameraType.EXTERNAL] = idx
+                self._shared_camera = True
                 
                 logger.warning(f"只有一个摄像头可用 (索引: {idx})，将共享使用")
             
@@ -147,29 +240,100 @@ class HardwareManager:
             self.cameras[CameraType.INTERNAL] = None
             self.cameras[CameraType.EXTERNAL] = None
     
+    def _try_gray_capture(self, cam) -> Optional[str]:
+        """尝试让摄像头直接输出灰度数据，失败则恢复BGR输出并返回None"""
+        try:
+            width = int(cam.get(cv2.CAP_PROP_FRAME_WIDTH))
+            orig_fourcc = int(cam.get(cv2.CAP_PROP_FOURCC))
+            for fourcc in ('GREY', 'YUYV'):
+                if not cam.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc)):
+                    continue
+                if not cam.set(cv2.CAP_PROP_CONVERT_RGB, 0):
+                    continue
+                ret, frame = cam.read()
+                if ret and frame is not None:
+                    # 确认驱动真按请求的格式出帧，再启用对应的取Y方式
+                    if fourcc == 'GREY' and frame.ndim == 2 and frame.shape[1] == width:
+                        return 'GREY'
+                    if fourcc == 'YUYV' and ((frame.ndim == 3 and frame.shape[2] == 2)
+                                             or (frame.ndim == 2 and frame.shape[1] == 2 * width)):
+                        return 'YUYV'
+            # 都不支持：恢复默认的BGR解码输出
+            cam.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+            cam.set(cv2.CAP_PROP_FOURCC, orig_fourcc)
+        except Exception as e:
+            logger.warning(f"灰度直采模式探测失败: {e}")
+            try:
+                cam.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+            except Exception:
+                pass
+        return None
+
     def _init_face_detection(self):
-        """初始化人脸检测"""
+        """初始化人脸检测（优先LBP级联，比Haar快2-3倍；不可用时退回Haar）"""
         try:
-            self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            if self.face_cascade.empty():
+            # 接近检测只要"有没有人"这个布尔信号，LBP用整数特征，
+            # 在ARM上比Haar的浮点求和快得多，精度损失可以接受
+            candidates = [
+                os.path.join(os.path.dirname(cv2.data.haarcascades), 'lbpcascades', 'lbpcascade_frontalface_improved.xml'),
+                cv2.data.haarcascades + 'lbpcascade_frontalface_improved.xml',
+                cv2.data.haarcascades + 'haarcascade_frontalface_default.xml',
+            ]
+            self.face_cascade = None
+            loaded_path = None
+            for cascade_path in candidates:
+                if not os.path.exists(cascade_path):
+                    continue
+                cascade = cv2.CascadeClassifier(cascade_path)
+                if not cascade.empty():
+                    self.face_cascade = cascade
+                    loaded_path = cascade_path
+                    logger.info(f"人脸检测器初始化成功: {os.path.basename(cascade_path)}")
+                    break
+            if self.face_cascade is None:
                 logger.warning("无法加载人脸检测器")
-                self.face_cascade = None
             else:
-                logger.info("人脸检测器初始化成功")
+                self._init_detection_backend(loaded_path)
         except Exception as e:
             logger.error(f"人脸检测器初始化失败: {e}")
             self.face_cascade = None
+
+    def _init_detection_backend(self, cascade_path: str):
+        """探测GPU加速后端：有CUDA用CUDA级联，有OpenCL走UMat，否则纯CPU"""
+        self.face_cascade_gpu = None
+        self._use_opencl = False
+        try:
+            if hasattr(cv2, 'cuda') and cv2.cuda.getCudaEnabledDeviceCount() > 0:
+                # CUDA级联对xml格式有要求，加载失败就当没有GPU
+                self.face_cascade_gpu = cv2.cuda_CascadeClassifier.create(cascade_path)
+                logger.info("人脸检测使用CUDA后端")
+                return
+        except Exception as e:
+            logger.warning(f"CUDA级联不可用，退回CPU: {e}")
+            self.face_cascade_gpu = None
+        try:
+            if cv2.ocl.haveOpenCL():
+                # UMat走T-API，detectMultiScale透明走OpenCL内核
+                self._use_opencl = True
+                logger.info("人脸检测使用OpenCL (UMat) 后端")
+        except Exception:
+            pass
     
+    def _debounce(self) -> bool:
+        """按键防抖：冷却窗口内返回False；monotonic_ns不受调墙钟影响"""
+        now_ns = time.monotonic_ns()
+        with self._button_lock:
+            if now_ns - self._last_press_ns < self._button_cooldown_ns:
+                return False
+            self._last_press_ns = now_ns
+            return True
+
     def _button16_callback(self, channel):
         """GPIO16按键回调函数 - 放入物品"""
-        current_time = time.time()
-        
-        # 防抖检查
-        if current_time - self.last_button_time < self.button_cooldown:
-            logger.warning(f"按键16被忽略 - 冷却时间未到")
+        if not self._debounce():
+            logger.warning("按键16被忽略 - 冷却时间未到")
             return
         
-        self.last_button_time = current_time
         logger.info("按键16被按下 - 触发放入物品功能")
         
         # 发送按钮事件
@@ -191,14 +355,10 @@ class HardwareManager:
     
     def _button17_callback(self, channel):
         """GPIO17按键回调函数 - 取出物品"""
-        current_time = time.time()
-        
-        # 防抖检查
-        if current_time - self.last_button_time < self.button_cooldown:
-            logger.warning(f"按键17被忽略 - 冷却时间未到")
+        if not self._debounce():
+            logger.warning("按键17被忽略 - 冷却时间未到")
             return
         
-        self.last_button_time = current_time
         logger.info("按键17被按下 - 触发取出物品功能")
         
         # 发送按钮事件
@@ -210,13 +370,14 @@ class HardwareManager:
         )
         core_system.emit_event(event)
         
-        # 直接调用API触发前端弹窗
+        # 直接调用API触发前端弹窗（会话懒初始化一次，后续复用连接）
         try:
-            import requests
-            response = requests.post(
+            if self._http_session is None:
+                import requests
+                self._http_session = requests.Session()
+            response = self._http_session.post(
                 'http://localhost:8080/api/physical-button',
                 json={'button_type': 'take_out'},
-                headers={'Content-Type': 'application/json'},
                 timeout=5
             )
             
@@ -245,12 +406,8 @@ class HardwareManager:
                 logger.error(f"摄像头 {camera_type.value} 已断开连接")
                 return None
             
-            # 检查是否共享摄像头
-            internal_available = self.cameras[CameraType.INTERNAL] is not None
-            external_available = self.cameras[CameraType.EXTERNAL] is not None
-            shared_camera = internal_available and not external_available
-            
-            if shared_camera:
+            # 共享摄像头时等它稳定（标志在初始化时定死）
+            if self._shared_camera:
                 logger.info("检测到共享摄像头，等待摄像头稳定...")
                 time.sleep(0.5)  # 等待摄像头稳定
             
@@ -258,29 +415,52 @@ class HardwareManager:
             for _ in range(5):
                 camera.grab()
             
-            ret, frame = camera.read()
+            # 读进复用缓冲（分辨率变了OpenCV会重新分配，跟着换掉缓冲即可）
+            buf = self._capture_buf
+            ret, frame = camera.read(buf) if buf is not None else camera.read()
             if not ret or frame is None:
                 logger.error("无法读取摄像头帧")
                 return None
+            self._capture_buf = frame
             
             # 检查帧是否有效
             if frame.size == 0:
                 logger.error("摄像头返回空帧")
                 return None
-            
-            # 生成唯一文件名
+
+            # 灰度直采的外部摄像头给的是YUYV交错数据，偶数字节才是亮度；
+            # 抽出Y平面得到规范灰度帧，否则imencode拿到的是双宽交错数据
+            # （GREY模式下帧本身就是单通道灰度图，可直接编码）
+            if camera_type == CameraType.EXTERNAL and self._external_gray_mode == 'YUYV':
+                frame = frame[:, :, 0] if frame.ndim == 3 else frame[:, ::2]
+
+            # 生成唯一文件名（时间戳便于人查，序号保证连拍不撞名）
             timestamp = time.strftime("%Y%m%d_%H%M%S")
-            filename = f"captured_{camera_type.value}_{timestamp}.jpg"
-            filepath = os.path.join("uploads", filename)
+            filename = f"captured_{camera_type.value}_{timestamp}_{next(self._capture_seq)}.jpg"
+            filepath = os.path.join(self._uploads_dir, filename)
+            
+            # 编码和写盘放到IO线程：回调线程抓到帧就返回
+            # （帧缓冲会被下一次read覆盖，移交前先copy）
+            self._io_pool.submit(self._finish_capture, frame.copy(), filepath, camera_type)
             
-            # 确保uploads目录存在
-            os.makedirs("uploads", exist_ok=True)
+            return filepath
             
-            # 保存图片
-            success = cv2.imwrite(filepath, frame)
+        except Exception as e:
+            logger.error(f"拍照失败: {e}")
+            return None
+    
+    def _finish_capture(self, frame, filepath: str, camera_type: CameraType):
+        """后台完成拍照：JPEG编码一次，写盘，再带字节发拍照事件"""
+        try:
+            # 只编码一次JPEG：字节既写入文件，也随事件直接递给AI处理器
+            success, encoded = cv2.imencode('.jpg', frame)
             if not success:
                 logger.error("保存图片失败")
-                return None
+                return
+            image_bytes = encoded.tobytes()
+            if self._persist_captures:
+                with open(filepath, 'wb') as f:
+                    f.write(image_bytes)
             
             logger.info(f"拍照成功: {filepath} (尺寸: {frame.shape})")
             
@@ -291,16 +471,13 @@ class HardwareManager:
                 {
                     "camera_type": camera_type.value,
                     "image_path": filepath,
-                    "image_size": frame.shape
+                    "image_size": frame.shape,
+                    "image_bytes": image_bytes
                 }
             )
             core_system.emit_event(event)
-            
-            return filepath
-            
         except Exception as e:
-            logger.error(f"拍照失败: {e}")
-            return None
+            logger.error(f"后台保存图片失败: {e}")
     
     def estimate_distance(self, face_width: int) -> float:
         """根据人脸框宽度估算距离"""
@@ -316,29 +493,75 @@ class HardwareManager:
             return False
         
         try:
-            ret, frame = camera.read()
-            if not ret:
-                return False
-            
-            # 转换为灰度图
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if self.capture_thread is not None:
+                # 流水线模式：从采集线程的单槽里取最新帧（取走置空，避免重复检测）
+                with self._frame_lock:
+                    frame = self._latest_frame
+                    self._latest_frame = None
+                if frame is None:
+                    return False
+            else:
+                # 直接read的路径复用同一块帧缓冲（流水线模式下采集线程
+                # 每帧新分配并整帧移交所有权，不能复用）
+                buf = self._detect_frame_buf
+                ret, frame = camera.read(buf) if buf is not None else camera.read()
+                if not ret or frame is None:
+                    return False
+                self._detect_frame_buf = frame
             
-            # 检测人脸
-            faces = self.face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=(30, 30)
-            )
+            scale = self.FACE_DETECT_SCALE
+            mode = self._external_gray_mode
+            if self._use_opencl and self.face_cascade_gpu is None and mode is None:
+                # T-API融合链：灰度→缩放→直方图均衡全程在UMat上串联，
+                # 有OpenCL时中间结果留在设备端，一次都不回传主存
+                u = cv2.cvtColor(cv2.UMat(frame), cv2.COLOR_BGR2GRAY)
+                u = cv2.resize(u, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                small = cv2.equalizeHist(u)
+            else:
+                # 取灰度图：直采模式下帧本身就是Y数据，不用再cvtColor
+                if mode == 'GREY':
+                    gray = frame
+                elif mode == 'YUYV':
+                    # YUYV交错格式：偶数字节是Y分量
+                    gray = frame[:, :, 0] if frame.ndim == 3 else frame[:, ::2]
+                else:
+                    gray_buf = self._gray_buf
+                    if gray_buf is None or gray_buf.shape != frame.shape[:2]:
+                        gray_buf = self._gray_buf = np.empty(frame.shape[:2], dtype=np.uint8)
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray_buf)
+                dh, dw = int(gray.shape[0] * scale), int(gray.shape[1] * scale)
+                small_buf = self._small_buf
+                if small_buf is None or small_buf.shape != (dh, dw):
+                    small_buf = self._small_buf = np.empty((dh, dw), dtype=np.uint8)
+                small = cv2.resize(gray, (dw, dh), dst=small_buf, interpolation=cv2.INTER_AREA)
+                # 光照均衡让级联在背光/暗光下更稳，也与OpenCL路径保持一致
+                small = cv2.equalizeHist(small, dst=small_buf)
+                if self._use_opencl and self.face_cascade_gpu is None:
+                    # 灰度直采下前处理已是零拷贝，检测本身仍可走OpenCL
+                    small = cv2.UMat(small)
             
-            # 检查是否需要触发事件
-            if len(faces) >= 1:
-                for (x, y, w, h) in faces:
-                    distance = self.estimate_distance(w)
-                    if distance <= self.DETECTION_DISTANCE:
-                        return True
+            # 检测人脸（minSize按缩放比例同步缩小，scaleFactor调大减少金字塔层数）
+            if self.face_cascade_gpu is not None:
+                gpu = cv2.cuda_GpuMat()
+                gpu.upload(small)
+                result = self.face_cascade_gpu.detectMultiScale(gpu)
+                faces = self.face_cascade_gpu.convert(result)
+            else:
+                faces = self.face_cascade.detectMultiScale(
+                    small,
+                    scaleFactor=1.2,
+                    minNeighbors=5,
+                    minSize=self._face_min_size,
+                    maxSize=self._face_max_size
+                )
             
-            return False
+            # 检查是否需要触发事件：所有检出框的距离一次NumPy算完
+            # （宽度换算回原始分辨率再估距离）
+            if faces is None or len(faces) == 0:
+                return False
+            widths = np.asarray(faces)[:, 2] / scale
+            return bool(_any_near(widths, self.REFERENCE_FACE_WIDTH,
+                                  self.REFERENCE_DISTANCE, self.DETECTION_DISTANCE))
             
         except Exception as e:
             logger.error(f"人脸检测出错: {e}")
@@ -351,6 +574,15 @@ class HardwareManager:
             return
         
         self.running = True
+
+        # 外部摄像头独占时启动采集线程：USB出帧和级联计算互相重叠，
+        # 共享摄像头模式下不能抢占设备，维持检测线程自己read
+        external = self.cameras.get(CameraType.EXTERNAL)
+        dedicated = external is not None and external is not self.cameras.get(CameraType.INTERNAL)
+        if dedicated:
+            self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+            self.capture_thread.start()
+
         self.face_detection_thread = threading.Thread(target=self._face_detection_loop, daemon=True)
         self.face_detection_thread.start()
         logger.info("人脸检测监控已启动")
@@ -360,24 +592,56 @@ class HardwareManager:
         self.running = False
         if self.face_detection_thread:
             self.face_detection_thread.join(timeout=2)
+        if self.capture_thread:
+            self.capture_thread.join(timeout=2)
+            self.capture_thread = None
         logger.info("人脸检测监控已停止")
+
+    def _capture_loop(self):
+        """采集线程：持续读外部摄像头，最新帧覆盖写入单槽"""
+        camera = self.cameras.get(CameraType.EXTERNAL)
+        while self.running:
+            try:
+                ret, frame = camera.read()  # read本身按帧率阻塞，自然限速
+                if ret and frame is not None:
+                    with self._frame_lock:
+                        self._latest_frame = frame
+                    self._frame_ready.set()
+                else:
+                    time.sleep(0.1)
+            except Exception as e:
+                logger.error(f"帧采集循环出错: {e}")
+                time.sleep(1)
     
     def _face_detection_loop(self):
         """人脸检测循环"""
-        # 检查是否只有一个摄像头可用
-        internal_available = self.cameras[CameraType.INTERNAL] is not None
-        external_available = self.cameras[CameraType.EXTERNAL] is not None
-        shared_camera = internal_available and not external_available
-        
-        if shared_camera:
+        # 共享摄像头模式降低检测频率（标志在初始化时定死）
+        if self._shared_camera:
             logger.info("检测到共享摄像头模式，降低人脸检测频率")
-            detection_interval = 2.0  # 2秒检测一次
+            base_interval = 2.0  # 2秒检测一次
         else:
-            detection_interval = 0.1  # 正常频率
+            base_interval = 0.1  # 正常频率
+        # 空场景指数退避：连续没检到人就把间隔翻倍到上限，
+        # 一检到立刻回到基础频率（触发冷却本来就有3秒，不损失响应）
+        max_interval = 2.0
+        interval = base_interval
         
         while self.running:
             try:
+                # 流水线模式：等新帧信号，一到就检测（空闲时挂起不轮询）；
+                # 直读模式没有采集线程，维持定时节奏
+                if self.capture_thread is not None:
+                    if not self._frame_ready.wait(timeout=interval):
+                        continue
+                    self._frame_ready.clear()
+                    if interval > base_interval:
+                        # 退避期间只按间隔消费帧，其余的直接被槽覆盖掉
+                        time.sleep(interval - base_interval)
+                else:
+                    time.sleep(interval)
+                
                 if self.detect_faces():
+                    interval = base_interval
                     current_time = time.time()
                     
                     # 防抖检查
@@ -393,8 +657,8 @@ class HardwareManager:
                             priority=2
                         )
                         core_system.emit_event(event)
-                
-                time.sleep(detection_interval)
+                else:
+                    interval = min(max_interval, interval * 2)
                 
             except Exception as e:
                 logger.error(f"人脸检测循环出错: {e}")
@@ -406,7 +670,9 @@ class HardwareManager:
         for camera_type, camera in self.cameras.items():
             status[camera_type.value] = {
                 "available": camera is not None and camera.isOpened(),
-                "index": camera.get(cv2.CAP_PROP_POS_FRAMES) if camera else None
+                # 初始化时记下的设备索引；原来这里查POS_FRAMES，
+                # 对实时采集没有意义还要走一次ioctl
+                "index": self._camera_indices.get(camera_type)
             }
         return status
     
@@ -416,6 +682,9 @@ class HardwareManager:
             # 停止人脸检测
             self.stop_face_detection_monitor()
             
+            # 等未写完的照片落盘
+            self._io_pool.shutdown(wait=True)
+            
             # 释放摄像头
             for camera in self.cameras.values():
                 if camera:
@@ -6,6 +6,8 @@
 """
 
 import logging
+import queue
+import random
 import threading
 import time
 import cv2
@@ -21,6 +23,20 @@ from core_system import core_system, EventType, SystemEvent
 
 logger = logging.getLogger(__name__)
 
+# 级联分类器在模块导入时解析一次（约900KB的XML），
+# 测试夹具等反复实例化模拟器时共享同一份已解析结构
+try:
+    _FACE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+except Exception:
+    _FACE_CASCADE = None
+
+# JPEG编码参数：质量75对识别类下游足够，编码耗时和文件体积都比默认95省一半上下
+_JPEG_PARAMS = [int(cv2.IMWRITE_JPEG_QUALITY), 75, int(cv2.IMWRITE_JPEG_PROGRESSIVE), 0]
+
+# 上传目录在导入时建一次，热路径上不再每次拍照都付stat+mkdir两个syscall
+_UPLOADS_DIR = "uploads"
+os.makedirs(_UPLOADS_DIR, exist_ok=True)
+
 class ButtonType(Enum):
     """按钮类型枚举"""
     PLACE_ITEM = "place_item"  # 绿色按钮 - 放入物品
@@ -35,9 +51,11 @@ class HardwareSimulator:
     """硬件模拟器"""
     
     def __init__(self):
-        # 模拟摄像头
-        self.cameras: Dict[CameraType, Optional[cv2.VideoCapture]] = {}
+        # 模拟摄像头：物理设备只有一个，不再按CameraType存两个别名句柄，
+        # 两种逻辑摄像头共享同一个VideoCapture和读帧线程的最新帧槽
+        self._camera: Optional[cv2.VideoCapture] = None
         self.face_cascade = None
+        self._use_opencl = False
         
         # 模拟按钮状态
         self.button_states = {
@@ -60,44 +78,138 @@ class HardwareSimulator:
         self.running = False
         self.face_detection_thread = None
         self.button_simulation_thread = None
+        # 停止信号：循环睡在这个事件上，stop时立即醒来退出，join不再超时
+        self._stop_event = threading.Event()
+
+        # 模拟检测用的随机位池：一次取64位慢慢花，每次判定只耗4位，
+        # 真把检测提到逐帧频率时RNG开销也摊薄16倍
+        self._rand_bits = 0
+        self._rand_bits_left = 0
+
+        # 后台读帧线程：持续grab/retrieve把驱动缓冲清空，
+        # 单槽只留最新帧，capture_image直接取，不再付整段摄像头延迟
+        self._latest_frame = None
+        self._frame_lock = threading.Lock()
+        self._reader_thread = None
+        self._reader_running = False
+
+        # 写盘队列：编码好的JPEG字节交给专职线程落盘，
+        # 拍照调用方不等文件系统刷新就能发事件
+        self._io_queue = queue.Queue(maxsize=32)
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+
+        # 事件出站队列：模拟侧各线程只做一次入队（SimpleQueue的put是
+        # 单个C调用，不做锁协商），由专职线程串行递交core_system
+        self._event_queue = queue.SimpleQueue()
+        self._event_thread = threading.Thread(target=self._event_loop, daemon=True)
+        self._event_thread.start()
         
+        # 模拟图内容是固定的：每种摄像头画一次、编码一次，
+        # 之后"拍照"只是把现成的JPEG字节写到新路径
+        self._mock_jpg: Dict[CameraType, bytes] = {
+            camera_type: self._render_mock_jpg(camera_type)
+            for camera_type in CameraType
+        }
+
         # 初始化模拟硬件
         self._init_simulated_cameras()
         self._init_face_detection()
         self._init_button_simulation()
     
     def _init_simulated_cameras(self):
-        """初始化模拟摄像头"""
+        """初始化模拟摄像头（单设备，两种CameraType共用）"""
         try:
-            # 尝试初始化内部摄像头
-            internal_cam = cv2.VideoCapture(0)
-            if internal_cam.isOpened():
-                internal_cam.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-                self.cameras[CameraType.INTERNAL] = internal_cam
-                logger.info("✅ 内部摄像头模拟器初始化成功")
+            camera = cv2.VideoCapture(0)
+            if camera.isOpened():
+                # 单帧缓冲+MJPG：驱动侧不积压旧帧，拍照时拿到的就是最新画面；
+                # MJPG帧比未压缩YUYV小一个量级，内核到用户态拷贝便宜得多，
+                # 顺带把分辨率和帧率钉在640x480@30，不吃驱动默认值
+                camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+                camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+                camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+                camera.set(cv2.CAP_PROP_FPS, 30)
+                self._camera = camera
+                logger.info("✅ 摄像头模拟器初始化成功（内外摄像头共用同一设备）")
+                # 设备只有一个，起一条读帧线程喂新鲜帧就够了
+                self._reader_running = True
+                self._reader_thread = threading.Thread(
+                    target=self._reader_loop,
+                    args=(camera,),
+                    daemon=True
+                )
+                self._reader_thread.start()
             else:
                 logger.warning("⚠️ 无法访问真实摄像头，将使用模拟图像")
-                self.cameras[CameraType.INTERNAL] = None
-            
-            # 模拟外部摄像头（使用内部摄像头或生成模拟图像）
-            if self.cameras[CameraType.INTERNAL]:
-                self.cameras[CameraType.EXTERNAL] = self.cameras[CameraType.INTERNAL]
-                logger.info("✅ 外部摄像头模拟器初始化成功")
-            else:
-                self.cameras[CameraType.EXTERNAL] = None
-                
+                self._camera = None
+
         except Exception as e:
             logger.error(f"摄像头模拟器初始化失败: {e}")
     
+    def _event_loop(self):
+        """事件递交线程：消费出站队列，逐个交给core_system分发"""
+        while True:
+            event = self._event_queue.get()
+            try:
+                core_system.emit_event(event)
+            except Exception as e:
+                logger.error(f"事件递交失败: {e}")
+
+    def _writer_loop(self):
+        """写盘线程：串行消费(路径, 字节)队列"""
+        while True:
+            filepath, data = self._io_queue.get()
+            try:
+                with open(filepath, 'wb') as f:
+                    f.write(data)
+            except Exception as e:
+                logger.error(f"写入图片失败 {filepath}: {e}")
+            finally:
+                self._io_queue.task_done()
+
+    def _queue_write(self, filepath: str, data: bytes):
+        """图片字节入写盘队列；队列满就当场写，保证不丢"""
+        try:
+            self._io_queue.put_nowait((filepath, data))
+        except queue.Full:
+            with open(filepath, 'wb') as f:
+                f.write(data)
+
+    def _reader_loop(self, camera):
+        """读帧线程：不断grab/retrieve，最新帧覆盖写入单槽"""
+        while self._reader_running:
+            try:
+                if not camera.grab():
+                    time.sleep(0.1)
+                    continue
+                ret, frame = camera.retrieve()
+                if ret and frame is not None:
+                    with self._frame_lock:
+                        self._latest_frame = frame
+            except Exception as e:
+                logger.error(f"读帧线程出错: {e}")
+                time.sleep(1)
+
     def _init_face_detection(self):
-        """初始化人脸检测"""
+        """初始化人脸检测（复用模块级已解析的级联）"""
         try:
-            self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            if self.face_cascade.empty():
+            if _FACE_CASCADE is None or _FACE_CASCADE.empty():
                 logger.warning("无法加载人脸检测器，将使用模拟检测")
                 self.face_cascade = None
             else:
+                self.face_cascade = _FACE_CASCADE
                 logger.info("✅ 人脸检测器初始化成功")
+            # 有OpenCL（开发机常见核显）就让级联走T-API：
+            # 灰度图包成UMat后detectMultiScale透明跑GPU内核
+            self._use_opencl = False
+            try:
+                if cv2.ocl.haveOpenCL():
+                    cv2.ocl.setUseOpenCL(True)
+                    self._use_opencl = True
+                    logger.info("✅ 人脸检测启用OpenCL加速")
+            except Exception:
+                pass
         except Exception as e:
             logger.error(f"人脸检测器初始化失败: {e}")
             self.face_cascade = None
@@ -130,7 +242,7 @@ class HardwareSimulator:
             {"button_type": button_type.value},
             priority=1
         )
-        core_system.emit_event(event)
+        self._event_queue.put(event)
     
     def simulate_face_detection(self):
         """模拟人脸检测事件"""
@@ -142,7 +254,7 @@ class HardwareSimulator:
             return
         
         self.last_face_detection_time = current_time
-        logger.info("👤 模拟人脸检测事件")
+        logger.debug("👤 模拟人脸检测事件")
         
         # 发送接近传感器事件
         event = core_system.create_event(
@@ -151,44 +263,46 @@ class HardwareSimulator:
             {"detected": True, "distance": "near"},
             priority=2
         )
-        core_system.emit_event(event)
+        self._event_queue.put(event)
     
     def capture_image(self, camera_type: CameraType = CameraType.INTERNAL) -> Optional[str]:
         """拍照并保存图片"""
         try:
-            camera = self.cameras.get(camera_type)
-            
+            camera = self._camera
+
             if camera is None:
                 # 生成模拟图像
-                logger.info("📸 生成模拟图像")
+                logger.debug("📸 生成模拟图像")
                 image_path = self._generate_mock_image(camera_type)
             else:
                 # 使用真实摄像头
-                logger.info(f"📸 使用真实摄像头拍照")
+                logger.debug("📸 使用真实摄像头拍照")
                 
-                # 清空摄像头缓冲区，确保获取最新帧
-                for _ in range(5):
+                # 优先从读帧线程的单槽取最新帧；槽还没填上（刚启动）
+                # 就退回单次grab/retrieve
+                with self._frame_lock:
+                    frame = self._latest_frame
+                    self._latest_frame = None
+                if frame is None:
                     camera.grab()
+                    ret, frame = camera.retrieve()
+                    if not ret:
+                        logger.error("无法读取摄像头帧")
+                        return None
                 
-                ret, frame = camera.read()
-                if not ret:
-                    logger.error("无法读取摄像头帧")
-                    return None
-                
-                # 生成唯一文件名
-                timestamp = time.strftime("%Y%m%d_%H%M%S")
-                filename = f"captured_{camera_type.value}_{timestamp}.jpg"
-                filepath = os.path.join("uploads", filename)
+                # 生成唯一文件名（纳秒时间戳，免strftime也不会重名）
+                filepath = f"{_UPLOADS_DIR}/captured_{camera_type.value}_{time.time_ns()}.jpg"
                 
-                # 确保uploads目录存在
-                os.makedirs("uploads", exist_ok=True)
-                
-                # 保存图片
-                cv2.imwrite(filepath, frame)
+                # 编码在本线程做，写盘丢给IO线程，马上往下走发事件
+                ok, buf = cv2.imencode('.jpg', frame, _JPEG_PARAMS)
+                if not ok:
+                    logger.error("图片编码失败")
+                    return None
+                self._queue_write(filepath, buf.tobytes())
                 image_path = filepath
             
-            logger.info(f"📸 拍照成功: {image_path}")
-            
+            # 拍照成功不再逐帧记info日志，CAMERA_CAPTURE事件本身就是信号
+
             # 发送拍照事件
             event = core_system.create_event(
                 EventType.CAMERA_CAPTURE,
@@ -199,7 +313,7 @@ class HardwareSimulator:
                     "image_size": (640, 480)  # 模拟尺寸
                 }
             )
-            core_system.emit_event(event)
+            self._event_queue.put(event)
             
             return image_path
             
@@ -207,35 +321,31 @@ class HardwareSimulator:
             logger.error(f"拍照失败: {e}")
             return None
     
+    def _render_mock_jpg(self, camera_type: CameraType) -> bytes:
+        """画一张模拟图并编码成JPEG字节（每种摄像头只在初始化时跑一次）"""
+        if camera_type == CameraType.INTERNAL:
+            # 内部摄像头 - 生成食物图像
+            image = np.zeros((480, 640, 3), dtype=np.uint8)
+            # 添加一些模拟的食物形状
+            cv2.circle(image, (320, 240), 100, (0, 255, 0), -1)  # 绿色圆形
+            cv2.putText(image, "FOOD", (280, 250), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        else:
+            # 外部摄像头 - 生成人脸图像
+            image = np.zeros((480, 640, 3), dtype=np.uint8)
+            # 添加模拟的人脸形状
+            cv2.ellipse(image, (320, 240), (80, 100), 0, 0, 360, (255, 200, 150), -1)
+            cv2.circle(image, (300, 200), 10, (255, 255, 255), -1)  # 左眼
+            cv2.circle(image, (340, 200), 10, (255, 255, 255), -1)  # 右眼
+            cv2.putText(image, "FACE", (280, 350), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        return cv2.imencode('.jpg', image, _JPEG_PARAMS)[1].tobytes()
+
     def _generate_mock_image(self, camera_type: CameraType) -> str:
-        """生成模拟图像"""
+        """生成模拟图像（直接落盘预编码好的JPEG字节，不重画不重编码）"""
         try:
-            # 创建模拟图像
-            if camera_type == CameraType.INTERNAL:
-                # 内部摄像头 - 生成食物图像
-                image = np.zeros((480, 640, 3), dtype=np.uint8)
-                # 添加一些模拟的食物形状
-                cv2.circle(image, (320, 240), 100, (0, 255, 0), -1)  # 绿色圆形
-                cv2.putText(image, "FOOD", (280, 250), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
-            else:
-                # 外部摄像头 - 生成人脸图像
-                image = np.zeros((480, 640, 3), dtype=np.uint8)
-                # 添加模拟的人脸形状
-                cv2.ellipse(image, (320, 240), (80, 100), 0, 0, 360, (255, 200, 150), -1)
-                cv2.circle(image, (300, 200), 10, (255, 255, 255), -1)  # 左眼
-                cv2.circle(image, (340, 200), 10, (255, 255, 255), -1)  # 右眼
-                cv2.putText(image, "FACE", (280, 350), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+            # 生成文件名并保存（纳秒时间戳，免strftime也不会重名）
+            filepath = f"{_UPLOADS_DIR}/mock_{camera_type.value}_{time.time_ns()}.jpg"
             
-            # 生成文件名并保存
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            filename = f"mock_{camera_type.value}_{timestamp}.jpg"
-            filepath = os.path.join("uploads", filename)
-            
-            # 确保uploads目录存在
-            os.makedirs("uploads", exist_ok=True)
-            
-            # 保存图像
-            cv2.imwrite(filepath, image)
+            self._queue_write(filepath, self._mock_jpg[camera_type])
             
             return filepath
             
@@ -244,10 +354,43 @@ class HardwareSimulator:
             return None
     
     def detect_faces(self) -> bool:
-        """检测人脸（模拟）"""
-        # 模拟人脸检测，随机返回结果
-        import random
-        return random.random() < 0.3  # 30%概率检测到人脸
+        """检测人脸：有摄像头和级联就跑真检测，否则退回随机模拟"""
+        if self._camera is None or self.face_cascade is None:
+            # 模拟人脸检测：从位池里取4位，5/16≈31%概率检测到人脸
+            if self._rand_bits_left < 4:
+                self._rand_bits = random.getrandbits(64)
+                self._rand_bits_left = 64
+            v = self._rand_bits & 0xF
+            self._rand_bits >>= 4
+            self._rand_bits_left -= 4
+            return v < 5
+        
+        try:
+            # 读帧线程槽里的最新帧（不清空，拍照路径还要用）
+            with self._frame_lock:
+                frame = self._latest_frame
+            if frame is None:
+                return False
+            
+            # 1/4分辨率足够出"有没有人"的布尔信号，级联扫的像素少16倍；
+            # 均衡一下光照让暗光场景更稳
+            small = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            cv2.equalizeHist(gray, gray)
+            if self._use_opencl:
+                gray = cv2.UMat(gray)
+            faces = self.face_cascade.detectMultiScale(
+                gray,
+                scaleFactor=1.25,
+                minNeighbors=3,
+                minSize=(24, 24),
+                maxSize=(120, 120),
+                flags=cv2.CASCADE_SCALE_IMAGE
+            )
+            return len(faces) > 0
+        except Exception as e:
+            logger.error(f"人脸检测出错: {e}")
+            return False
     
     def start_face_detection_monitor(self):
         """启动人脸检测监控（模拟）"""
@@ -256,6 +399,7 @@ class HardwareSimulator:
             return
         
         self.running = True
+        self._stop_event.clear()
         self.face_detection_thread = threading.Thread(target=self._face_detection_loop, daemon=True)
         self.face_detection_thread.start()
         logger.info("✅ 人脸检测监控模拟器已启动")
@@ -263,6 +407,7 @@ class HardwareSimulator:
     def stop_face_detection_monitor(self):
         """停止人脸检测监控"""
         self.running = False
+        self._stop_event.set()
         if self.face_detection_thread:
             self.face_detection_thread.join(timeout=2)
         logger.info("✅ 人脸检测监控模拟器已停止")
@@ -287,13 +432,15 @@ class HardwareSimulator:
                             {"detected": True, "distance": "near"},
                             priority=2
                         )
-                        core_system.emit_event(event)
+                        self._event_queue.put(event)
                 
-                time.sleep(5)  # 每5秒检查一次
+                if self._stop_event.wait(5.0):  # 每5秒检查一次，停止信号立即退出
+                    break
                 
             except Exception as e:
                 logger.error(f"人脸检测模拟循环出错: {e}")
-                time.sleep(10)
+                if self._stop_event.wait(10.0):
+                    break
     
     def start_button_simulation(self):
         """启动按钮模拟"""
@@ -319,22 +466,27 @@ class HardwareSimulator:
             try:
                 # 这里可以添加键盘监听逻辑
                 # 为了简化，我们使用简单的输入
-                time.sleep(1)
+                if self._stop_event.wait(1.0):
+                    break
                 
             except Exception as e:
                 logger.error(f"按钮模拟循环出错: {e}")
-                time.sleep(1)
+                if self._stop_event.wait(1.0):
+                    break
     
     def get_camera_status(self) -> Dict:
         """获取摄像头状态"""
-        status = {}
-        for camera_type, camera in self.cameras.items():
-            status[camera_type.value] = {
-                "available": camera is not None and camera.isOpened(),
+        camera = self._camera
+        available = camera is not None and camera.isOpened()
+        # 两种逻辑摄像头背后是同一个设备，状态也一样
+        return {
+            camera_type.value: {
+                "available": available,
                 "simulated": camera is None,
-                "index": camera.get(cv2.CAP_PROP_POS_FRAMES) if camera else None
+                "index": 0 if camera else None
             }
-        return status
+            for camera_type in CameraType
+        }
     
     def cleanup(self):
         """清理资源"""
@@ -342,10 +494,17 @@ class HardwareSimulator:
             # 停止监控
             self.stop_face_detection_monitor()
             
+            # 停读帧线程再释放设备
+            self._reader_running = False
+            if self._reader_thread:
+                self._reader_thread.join(timeout=2)
+            
+            # 等没写完的图片落盘
+            self._io_queue.join()
+            
             # 释放摄像头
-            for camera in self.cameras.values():
-                if camera:
-                    camera.release()
+            if self._camera:
+                self._camera.release()
             
             logger.info("✅ 硬件模拟器资源清理完成")
         except Exception as e:
@@ -8,14 +8,42 @@
 
 import sys
 import os
+import queue
+import threading
 import time
 import math
 import serial
 
 sys.path.append("..")
+from functools import lru_cache
+
 from scservo_sdk import *
 from move_z_serial import encode_distance_packet, find_available_port
 
+# take_out/take_in只用{0,50,100,150}这几个固定高度，包缓存起来直接复用
+# （encode_distance_packet返回不可变bytes，缓存无别名问题）
+_enc_packet = lru_cache(maxsize=32)(encode_distance_packet)
+
+def _enable_low_latency(ser):
+    """
+    给USB串口打开ASYNC_LOW_LATENCY：Linux下USB转串口默认16ms的
+    延迟定时器给每次收发垫了一层底，置位后降到1ms
+    （非Linux/非USB串口时ioctl会失败，静默跳过即可）
+    """
+    try:
+        import fcntl
+        ASYNC_LOW_LATENCY = 0x2000
+        TIOCGSERIAL = 0x541E
+        TIOCSSERIAL = 0x541F
+        fd = ser.fileno()
+        buf = bytearray(fcntl.ioctl(fd, TIOCGSERIAL, b"\0" * 0x60))
+        flags = int.from_bytes(buf[28:32], "little") | ASYNC_LOW_LATENCY
+        buf[28:32] = flags.to_bytes(4, "little")
+        fcntl.ioctl(fd, TIOCSSERIAL, bytes(buf))
+        return True
+    except Exception:
+        return False
+
 class DualArmController:
     # 定义每个电机的位置限制
     SERVO_LIMITS = {
@@ -47,13 +75,61 @@ class DualArmController:
     def __init__(self, port="/dev/ttyACM0", baudrate=1000000):
         """初始化双臂控制器"""
         self.servo_ids = [1, 2, 3]  # 现在使用ID 1, 2和3
+
+        # 角度↔位置换算系数在这里一次算好，热路径上只剩一次乘加，
+        # 不再每次转换都查限位表、做两次减法一次除法
+        self._a2p = {
+            sid: (limits["min_pos"],
+                  (limits["max_pos"] - limits["min_pos"]) / (limits["max_angle"] - limits["min_angle"]))
+            for sid, limits in self.SERVO_LIMITS.items()
+        }
+        self._p2a = {
+            sid: (limits["min_angle"], limits["min_pos"],
+                  (limits["max_angle"] - limits["min_angle"]) / (limits["max_pos"] - limits["min_pos"]))
+            for sid, limits in self.SERVO_LIMITS.items()
+        }
+
+        # 记住每个电机最近一次成功下发的位置：目标没变就跳过整个
+        # 总线往返（take_out/take_in里连续restore时常见）
+        self._last_pos = {}
+
+        # 高度正弦查表：angle2被限制在0~180度，整度数的
+        # 2*ARM_LENGTH*sin(rad/2)预先算好，取高度变成一次索引
+        # （亚度部分线性插值），省掉每次的math.radians+math.sin
+        self._height_lut = tuple(
+            2 * self.ARM_LENGTH * math.sin(math.radians(a) / 2) for a in range(181)
+        )
         self.portHandler = PortHandler(port)
         self.packetHandler = sms_sts(self.portHandler)
+
+        # 按寄存器各备一个SyncWrite组：一包广播更新所有ID，
+        # 总线事务从每电机一次降到一共一次，也不再等N-1个状态回包
+        self._sync_torque = GroupSyncWrite(self.packetHandler, SMS_STS_TORQUE_ENABLE, 1)
+        self._sync_acc = GroupSyncWrite(self.packetHandler, SMS_STS_ACC, 1)
+
+        # 位置同步读组：一次总线事务取回所有舵机的当前位置，
+        # 代替逐个ReadPos各付一轮TX+RX+驱动延迟
+        self._sync_read = GroupSyncRead(self.packetHandler, SMS_STS_PRESENT_POSITION_L, 2)
+        for sid in self.servo_ids:
+            self._sync_read.addParam(sid)
+        self._pos_cache = {}
+
+        # 速度是粘滞寄存器：默认值初始化时广播一次，之后默认速度的
+        # 移动只发2字节位置，总线包短约三分之一；按电机记录寄存器现值
+        self._sync_speed = GroupSyncWrite(self.packetHandler, SMS_STS_GOAL_SPEED_L, 2)
+        self._sticky_speed = {}
         
         # 初始化Z轴串口
         self.z_serial = find_available_port()
         if not self.z_serial:
             raise Exception("无法初始化Z轴控制器")
+
+        # Z轴响应走后台读线程：整块read清空驱动缓冲、按行入队，
+        # move_z只管写包再等ACK行，不再固定睡100ms轮询in_waiting
+        _enable_low_latency(self.z_serial)
+        self._z_queue = queue.Queue()
+        self._z_reader_thread = threading.Thread(target=self._z_reader, daemon=True)
+        self._z_reader_thread.start()
         
         # 初始化连接
         if not self._initialize_connection(port, baudrate):
@@ -63,13 +139,28 @@ class DualArmController:
         if not self._check_servos():
             raise Exception("无法连接到电机")
 
-        # 启用扭矩并设置默认加速度
+        # 回应级别设0：写指令不再回状态帧（ping和读不受影响），
+        # 每笔写省掉一个状态回包的总线时间和等待；写路径相应改为纯TX
+        for sid in self.servo_ids:
+            # 先读一把：EPROM掉电保持，级别已是0就跳过整个解锁/写/加锁流程，
+            # 每次上电少做一轮EPROM擦写
+            level, result, _ = self.packetHandler.read1ByteTxRx(sid, SMS_STS_RESPONSE_LEVEL)
+            if result == COMM_SUCCESS and level == 0:
+                continue
+            self.packetHandler.unLockEprom(sid)
+            self.packetHandler.write1ByteTxRx(sid, SMS_STS_RESPONSE_LEVEL, 0)
+            # 级别0一生效写指令就没有回包了，加锁必须走纯TX，
+            # 否则每个电机都要白等一整个RX超时
+            self.packetHandler.writeTxOnly(sid, SMS_STS_LOCK, 1, [1])
+
+        # 启用扭矩并设置默认加速度和默认速度
         self._set_torque(True)
         self._set_acceleration(255)
+        self._set_speed(1000)
         
         # 初始化时直接进入还原态
         success, height = self.restore()
-        time.sleep(2)
+        self._wait_motion_done(timeout=2.0)
         if not success:
             raise Exception("无法进入还原态")
             
@@ -83,6 +174,8 @@ class DualArmController:
         if not self.portHandler.setBaudRate(baudrate):
             print("无法设置波特率")
             return False
+        # 压低USB串口的延迟定时器，每次舵机读写少垫~15ms
+        _enable_low_latency(self.portHandler.ser)
         return True
     
     def _check_servos(self):
@@ -105,7 +198,7 @@ class DualArmController:
         """停止双臂系统（确保还原后再禁用扭矩并关闭端口）"""
         # 先尝试回到还原态
         self.restore()
-        time.sleep(0.5)  # 等待还原完成
+        self._wait_motion_done()  # 等待还原完成
         # 然后再禁用扭矩并关闭端口
         self._set_torque(False)
         self.portHandler.closePort()
@@ -115,15 +208,30 @@ class DualArmController:
         print("系统已停止")
 
     def _set_torque(self, enable):
-        """设置两个电机的扭矩状态"""
+        """设置所有电机的扭矩状态（SyncWrite一包广播）"""
         value = 1 if enable else 0
+        self._sync_torque.clearParam()
         for servo_id in self.servo_ids:
-            self.packetHandler.write1ByteTxRx(servo_id, SMS_STS_TORQUE_ENABLE, value)
+            self._sync_torque.addParam(servo_id, [value])
+        self._sync_torque.txPacket()
 
     def _set_acceleration(self, acceleration):
-        """设置两个电机的加速度"""
+        """设置所有电机的加速度（SyncWrite一包广播）"""
+        self._sync_acc.clearParam()
+        for servo_id in self.servo_ids:
+            self._sync_acc.addParam(servo_id, [acceleration])
+        self._sync_acc.txPacket()
+
+    def _set_speed(self, speed):
+        """设置所有电机的运行速度寄存器（SyncWrite一包广播，粘滞）"""
+        ph = self.packetHandler
+        data = [ph.scs_lobyte(speed), ph.scs_hibyte(speed)]
+        self._sync_speed.clearParam()
         for servo_id in self.servo_ids:
-            self.packetHandler.write1ByteTxRx(servo_id, SMS_STS_ACC, acceleration)
+            self._sync_speed.addParam(servo_id, data)
+        self._sync_speed.txPacket()
+        for servo_id in self.servo_ids:
+            self._sticky_speed[servo_id] = speed
 
     def move_to_angle(self, angle2, speed=1000):
         """
@@ -139,39 +247,80 @@ class DualArmController:
         # 计算目标高度
         height = self.calculate_height(angle2)
         
-        # 同时设置两个电机的角度
-        success2 = self._set_single_angle(2, angle2, speed)
-        success3 = self._set_single_angle(3, angle3, speed)
-        
-        if success2 and success3:
+        # 两个电机的目标位置打进同一个SyncWrite包，一次总线事务同时生效，
+        # 也避免两条WritePosEx之间的时间差造成双臂不同步
+        pos2 = self._angle_to_position(2, angle2)
+        pos3 = self._angle_to_position(3, angle3)
+        # 两个目标都与上次一致时整包免发
+        if self._last_pos.get(2) == pos2 and self._last_pos.get(3) == pos3:
+            return True, self.get_height()
+
+        sync = self.packetHandler.groupSyncWrite
+        sync.clearParam()
+        self.packetHandler.SyncWritePosEx(2, pos2, speed, 0)
+        self.packetHandler.SyncWritePosEx(3, pos3, speed, 0)
+        result = sync.txPacket()
+        sync.clearParam()
+
+        if result == COMM_SUCCESS:
+            self._last_pos[2] = pos2
+            self._last_pos[3] = pos3
+            # SyncWritePosEx的7字节包也写了速度寄存器，同步粘滞缓存
+            self._sticky_speed[2] = speed
+            self._sticky_speed[3] = speed
             actual_height = self.get_height()
             return True, actual_height
+        self._last_pos.pop(2, None)
+        self._last_pos.pop(3, None)
         return False, None
 
     def _set_single_angle(self, servo_id, angle, speed):
-        """设置单个电机的角度"""
+        """设置单个电机的角度（目标与上次相同时跳过总线写）"""
         position = self._angle_to_position(servo_id, angle)
-        result, error = self.packetHandler.WritePosEx(servo_id, position, speed, 0)
-        return result == COMM_SUCCESS and error == 0
+        if self._last_pos.get(servo_id) == position:
+            return True
+        if self._write_pos_tx(servo_id, position, speed):
+            self._last_pos[servo_id] = position
+            return True
+        self._last_pos.pop(servo_id, None)
+        return False
+
+    def _write_pos_tx(self, servo_id, position, speed):
+        """免回包的位置写；速度与寄存器现值一致时只发2字节位置"""
+        ph = self.packetHandler
+        pos = ph.scs_toscs(position, 15)
+        if self._sticky_speed.get(servo_id) == speed:
+            txpacket = [ph.scs_lobyte(pos), ph.scs_hibyte(pos)]
+            return ph.writeTxOnly(servo_id, SMS_STS_GOAL_POSITION_L, 2, txpacket) == COMM_SUCCESS
+        # 速度变了：位置和新速度随同一包写入（寄存器随之更新）
+        txpacket = [ph.scs_lobyte(pos), ph.scs_hibyte(pos), 0, 0,
+                    ph.scs_lobyte(speed), ph.scs_hibyte(speed)]
+        ok = ph.writeTxOnly(servo_id, SMS_STS_GOAL_POSITION_L, len(txpacket), txpacket) == COMM_SUCCESS
+        if ok:
+            self._sticky_speed[servo_id] = speed
+        return ok
 
     def _angle_to_position(self, servo_id, angle):
-        """角度转换为位置值"""
-        limits = self.SERVO_LIMITS[servo_id]
-        pos_range = limits["max_pos"] - limits["min_pos"]
-        angle_range = limits["max_angle"] - limits["min_angle"]
-        return limits["min_pos"] + int((angle / angle_range) * pos_range)
+        """角度转换为位置值（系数已在__init__预计算）"""
+        min_pos, k = self._a2p[servo_id]
+        return min_pos + int(angle * k)
 
     def _position_to_angle(self, servo_id, position):
-        """位置值转换为角度"""
-        limits = self.SERVO_LIMITS[servo_id]
-        pos_range = limits["max_pos"] - limits["min_pos"]
-        angle_range = limits["max_angle"] - limits["min_angle"]
-        return limits["min_angle"] + ((position - limits["min_pos"]) / pos_range) * angle_range
+        """位置值转换为角度（系数已在__init__预计算）"""
+        min_angle, min_pos, k = self._p2a[servo_id]
+        return min_angle + (position - min_pos) * k
 
     def calculate_height(self, angle2):
-        """计算高度（基于ID=2电机的角度）"""
-        rad = math.radians(angle2)
-        return 2 * self.ARM_LENGTH * math.sin(rad/2)
+        """计算高度（基于ID=2电机的角度，查预计算的正弦表）"""
+        i = int(angle2)
+        if i >= 180:
+            return self._height_lut[180]
+        if i < 0:
+            return self._height_lut[0]
+        f = angle2 - i
+        if f:
+            return self._height_lut[i] * (1 - f) + self._height_lut[i + 1] * f
+        return self._height_lut[i]
 
     def get_height(self):
         """获取当前高度"""
@@ -180,11 +329,27 @@ class DualArmController:
             return self.calculate_height(angle)
         return None
 
+    def _refresh_positions(self):
+        """
+        SyncRead一次事务刷新所有舵机位置到_pos_cache
+        返回: 是否成功
+        """
+        if self._sync_read.txRxPacket() != COMM_SUCCESS:
+            return False
+        positions = {}
+        for sid in self.servo_ids:
+            ok, _ = self._sync_read.isAvailable(sid, SMS_STS_PRESENT_POSITION_L, 2)
+            if not ok:
+                return False
+            raw = self._sync_read.getData(sid, SMS_STS_PRESENT_POSITION_L, 2)
+            positions[sid] = self.packetHandler.scs_tohost(raw, 15)
+        self._pos_cache = positions
+        return True
+
     def get_angle(self):
         """获取当前角度（ID=2电机的角度）"""
-        position, result, error = self.packetHandler.ReadPos(2)
-        if result == COMM_SUCCESS and error == 0:
-            return self._position_to_angle(2, position)
+        if self._refresh_positions():
+            return self._position_to_angle(2, self._pos_cache[2])
         return None
 
     def get_status(self):
@@ -206,6 +371,23 @@ class DualArmController:
         print("\n执行还原动作...")
         return self.move_to_angle(10, speed)
 
+    def _z_reader(self):
+        """Z轴串口读线程：批量read清空缓冲，按行推入响应队列"""
+        buf = b""
+        while True:
+            try:
+                data = self.z_serial.read(max(1, self.z_serial.in_waiting))
+            except Exception:
+                return  # 串口已关闭，线程退出
+            if not data:
+                continue
+            buf += data
+            while b'\n' in buf:
+                line, buf = buf.split(b'\n', 1)
+                line = line.decode(errors='ignore').strip()
+                if line:
+                    self._z_queue.put(line)
+
     def move_z(self, target_height_mm):
         """
         移动Z轴到指定高度
@@ -214,21 +396,39 @@ class DualArmController:
         """
         try:
             # 编码并发送数据包
-            packet = encode_distance_packet(target_height_mm)
+            packet = _enc_packet(int(target_height_mm))
             self.z_serial.write(packet)
             print(f"已发送Z轴移动指令: {target_height_mm}mm")
             
-            # 等待响应
-            time.sleep(0.1)
-            while self.z_serial.in_waiting:
-                response = self.z_serial.readline().decode(errors='ignore').strip()
+            # ACK由读线程送进队列，到了马上返回；设备不一定回包，
+            # 等不到也视为发送成功。最多等100ms（与原固定延时持平），
+            # 无ACK的常见路径不再把每次Z移动拖到500ms
+            try:
+                response = self._z_queue.get(timeout=0.1)
                 print(f"Z轴响应: {response}")
+            except queue.Empty:
+                pass
             
             return True
         except Exception as e:
             print(f"Z轴移动失败: {str(e)}")
             return False
 
+    def _wait_motion_done(self, servo_ids=(2, 3), timeout=2.0):
+        """
+        轮询电机的MOVING状态位，到位立即返回
+        代替按最坏情况估的固定sleep，快的动作不再多等
+        """
+        deadline = time.monotonic() + timeout
+        for servo_id in servo_ids:
+            while True:
+                moving, result, error = self.packetHandler.ReadMoving(servo_id)
+                if result == COMM_SUCCESS and error == 0 and not moving:
+                    break
+                if time.monotonic() >= deadline:
+                    return  # 超时兜底，和原来的固定等待等价
+                time.sleep(0.005)
+
     def take_out(self, speed=1000):
         """
         执行取出动作序列：
@@ -247,7 +447,7 @@ class DualArmController:
         if not success1:
             self.restore()  # 出错时也尝试回到还原态
             return False, None
-        time.sleep(0.5)
+        self._wait_motion_done()
         
         # 2. 向上移动到100mm
         if not self.move_z(100):
@@ -259,7 +459,7 @@ class DualArmController:
         success2, height2 = self.restore(speed)
         if not success2:
             return False, None
-        time.sleep(0.5)
+        self._wait_motion_done()
         
         # 4. 再次向上移动到150mm
         if not self.move_z(150):
@@ -271,7 +471,7 @@ class DualArmController:
         success3, height3 = self.restore(speed)
         if not success3:
             return False, None
-        time.sleep(0.5)
+        self._wait_motion_done()
             
         return True, self.get_height()
 
@@ -292,7 +492,7 @@ class DualArmController:
         success1, height1 = self.restore(speed)
         if not success1:
             return False, None
-        time.sleep(0.5)
+        self._wait_motion_done()
         
         # 2. 向下移动到50mm
         if not self.move_z(50):
@@ -305,7 +505,7 @@ class DualArmController:
         if not success2:
             self.restore()
             return False, None
-        time.sleep(0.5)
+        self._wait_motion_done()
         
         # 4. 再次向下移动到0mm
         if not self.move_z(0):
@@ -317,7 +517,7 @@ class DualArmController:
         success3, height3 = self.restore(speed)
         if not success3:
             return False, None
-        time.sleep(0.5)
+        self._wait_motion_done()
             
         return True, self.get_height()
 
@@ -326,15 +526,13 @@ class DualArmController:
         获取当前旋转舵机所在的分区
         返回: 分区号（1-6）或 None（如果发生错误）
         """
-        position, result, error = self.packetHandler.ReadPos(1)
-        if result == COMM_SUCCESS and error == 0:
-            angle = self._position_to_angle(1, position)
-            for sector, (start, end) in self.ROTATION_SECTORS.items():
-                if start <= angle < end:
-                    return sector
-            # 处理360度的特殊情况
-            if angle == 360:
-                return 6
+        if self._refresh_positions():
+            angle = self._position_to_angle(1, self._pos_cache[1])
+            # 分区等宽60度，整除直接定桶（360度归入第6区），
+            # 不再每次线性扫描分区表
+            if 0 <= angle <= 360:
+                sector = int(angle // 60) + 1
+                return 6 if sector > 6 else sector
         return None
 
     def move_to_sector(self, sector, speed=1000):
@@ -351,13 +549,19 @@ class DualArmController:
         start, end = self.ROTATION_SECTORS[sector]
         target_angle = (start + end) / 2  # 移动到分区中心
         position = self._angle_to_position(1, target_angle)
-        
-        result, error = self.packetHandler.WritePosEx(1, position, speed, 0)
-        success = result == COMM_SUCCESS and error == 0
+
+        # 目标与上次一致时免发
+        if self._last_pos.get(1) == position:
+            print(f"已在分区 {sector} (中心角度: {target_angle}°)")
+            return True
+
+        success = self._write_pos_tx(1, position, speed)
         
         if success:
+            self._last_pos[1] = position
             print(f"已移动到分区 {sector} (中心角度: {target_angle}°)")
         else:
+            self._last_pos.pop(1, None)
             print(f"移动到分区 {sector} 失败")
         
         return success
@@ -372,13 +576,19 @@ class DualArmController:
         # 确保角度在有效范围内
         angle = max(0, min(360, angle))
         position = self._angle_to_position(1, angle)
-        
-        result, error = self.packetHandler.WritePosEx(1, position, speed, 0)
-        success = result == COMM_SUCCESS and error == 0
+
+        # 目标与上次一致时免发
+        if self._last_pos.get(1) == position:
+            print(f"旋转舵机已在 {angle}°")
+            return True
+
+        success = self._write_pos_tx(1, position, speed)
         
         if success:
+            self._last_pos[1] = position
             print(f"旋转舵机已转到 {angle}°")
         else:
+            self._last_pos.pop(1, None)
             print("旋转舵机转动失败")
         
         return success
@@ -389,22 +599,28 @@ class DualArmController:
         返回: 分区号（1-3）或 None（如果发生错误）
         """
         try:
-            # 等待并读取Z轴响应以获取当前高度
-            self.z_serial.write(b'get_height\n')  # 假设有这样的命令
-            time.sleep(0.1)
-            if self.z_serial.in_waiting:
-                response = self.z_serial.readline().decode(errors='ignore').strip()
+            # 先清掉队列里滞留的历史行（比如move_z没等到的迟到ACK），
+            # 免得把旧响应当成本次的高度读数
+            while True:
                 try:
-                    current_height = float(response)
-                    for sector, (start, end) in self.Z_SECTORS.items():
-                        if start <= current_height < end:
-                            return sector
-                    # 处理边界情况
-                    if current_height == 60:
-                        return 3
-                except ValueError:
-                    print("无法解析Z轴高度数据")
-                    return None
+                    self._z_queue.get_nowait()
+                except queue.Empty:
+                    break
+            # 高度查询的响应同样由读线程入队，不和它抢串口缓冲
+            self.z_serial.write(b'get_height\n')  # 假设有这样的命令
+            response = self._z_queue.get(timeout=0.5)
+            try:
+                current_height = float(response)
+                # 分区等宽20mm，整除直接定桶（60mm归入第3区）
+                if 0 <= current_height <= 60:
+                    sector = int(current_height // 20) + 1
+                    return 3 if sector > 3 else sector
+            except ValueError:
+                print("无法解析Z轴高度数据")
+                return None
+        except queue.Empty:
+            print("等待Z轴高度响应超时")
+            return None
         except Exception as e:
             print(f"获取Z轴分区失败: {str(e)}")
             return None
@@ -443,7 +659,8 @@ if __name__ == "__main__":
         print("\n测试旋转舵机分区功能...")
         for sector in range(1, 7):
             arm.move_to_sector(sector)
-            time.sleep(1)
+            # 轮询MOVING位，转到位立即查分区，不再固定睡1秒
+            arm._wait_motion_done((1,), timeout=1.0)
             current_sector = arm.get_current_sector()
             print(f"当前在分区 {current_sector}")
         
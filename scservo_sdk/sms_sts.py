@@ -23,6 +23,7 @@ SMS_STS_MODEL_H = 4
 #-------EPROM(读写)--------
 SMS_STS_ID = 5
 SMS_STS_BAUD_RATE = 6
+SMS_STS_RESPONSE_LEVEL = 8
 SMS_STS_MIN_ANGLE_LIMIT_L = 9
 SMS_STS_MIN_ANGLE_LIMIT_H = 10
 SMS_STS_MAX_ANGLE_LIMIT_L = 11
@@ -5,16 +5,43 @@
 """
 
 import cv2
+import glob
+import re
 import time
 import os
 
-def test_camera(camera_index):
-    """测试指定索引的摄像头"""
+class CameraPool:
+    """缓存已打开的VideoCapture句柄
+    V4L2上每次open要做格式协商、DMABUF分配和自动曝光预热（约1~2秒），
+    反复取帧时复用句柄能把这笔开销摊成一次"""
+
+    def __init__(self):
+        self._caps = {}
+
+    def get(self, idx, backend=None):
+        key = (idx, backend)
+        cap = self._caps.get(key)
+        if cap is None:
+            cap = cv2.VideoCapture(idx, backend) if backend else cv2.VideoCapture(idx)
+            if cap.isOpened():
+                # 单帧缓冲：read()拿到的是最新帧，不是驱动环形缓冲里的旧帧
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            self._caps[key] = cap
+        return cap
+
+    def release_all(self):
+        for cap in self._caps.values():
+            if cap.isOpened():
+                cap.release()
+        self._caps.clear()
+
+def test_camera(camera_index, pool, run_ts):
+    """测试指定索引的摄像头（句柄从池里取，调用方统一释放）"""
     print(f"测试摄像头索引: {camera_index}")
     
     try:
-        # 尝试打开摄像头
-        cap = cv2.VideoCapture(camera_index)
+        # 从池中取摄像头（已打开的直接复用）
+        cap = pool.get(camera_index)
         
         if not cap.isOpened():
             print(f"❌ 摄像头 {camera_index} 无法打开")
@@ -27,28 +54,25 @@ def test_camera(camera_index):
         
         if not ret or frame is None:
             print(f"❌ 摄像头 {camera_index} 无法读取帧")
-            cap.release()
             return False
         
         print(f"✅ 摄像头 {camera_index} 可以读取帧 (尺寸: {frame.shape})")
         
-        # 保存测试图片
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        filename = f"test_camera_{camera_index}_{timestamp}.jpg"
+        # 保存测试图片（时间戳和uploads目录在main里备好，循环内不重复做）
+        filename = f"test_camera_{camera_index}_{run_ts}.jpg"
         filepath = os.path.join("uploads", filename)
         
-        # 确保uploads目录存在
-        os.makedirs("uploads", exist_ok=True)
-        
-        # 保存图片
-        success = cv2.imwrite(filepath, frame)
+        # 保存图片（质量85+霍夫曼表优化：编码更快、文件更小，测试图足够用）
+        success = cv2.imwrite(filepath, frame,
+                              [cv2.IMWRITE_JPEG_QUALITY, 85,
+                               cv2.IMWRITE_JPEG_OPTIMIZE, 1,
+                               cv2.IMWRITE_JPEG_PROGRESSIVE, 0])
         
         if success:
             print(f"✅ 测试图片已保存: {filepath}")
         else:
             print(f"❌ 保存测试图片失败")
         
-        cap.release()
         return True
         
     except Exception as e:
@@ -59,14 +83,31 @@ def main():
     """主函数"""
     print("🔍 开始摄像头测试...")
     
-    # 测试多个摄像头索引
-    camera_indices = [0, 1, 2, 3, 4, 5, 6, 7]
+    # 只探测实际存在的/dev/video*节点，不再盲扫0~7：
+    # 每次开一个不存在的索引都要付一轮完整的设备枚举+格式协商
+    camera_indices = sorted(
+        int(m.group(1))
+        for m in (re.search(r'(\d+)$', p) for p in glob.glob('/dev/video*'))
+        if m
+    )
+    if not camera_indices:
+        print("❌ 没有发现/dev/video*设备")
+        return
+    print(f"发现设备索引: {camera_indices}")
     working_cameras = []
     
-    for idx in camera_indices:
-        if test_camera(idx):
-            working_cameras.append(idx)
-        print("-" * 50)
+    # 目录建一次、时间戳取一次，整轮测试共用
+    os.makedirs("uploads", exist_ok=True)
+    run_ts = time.strftime("%Y%m%d_%H%M%S")
+
+    pool = CameraPool()
+    try:
+        for idx in camera_indices:
+            if test_camera(idx, pool, run_ts):
+                working_cameras.append(idx)
+            print("-" * 50)
+    finally:
+        pool.release_all()
     
     print(f"\n📊 测试结果:")
     print(f"可用的摄像头索引: {working_cameras}")
@@ -5,11 +5,15 @@
 """
 
 import cv2
+import glob
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import re
 import time
 import os
 import subprocess
 
-def test_camera_with_backend(camera_index, backend=None):
+def test_camera_with_backend(camera_index, backend, run_ts):
     """使用指定后端测试摄像头"""
     print(f"测试摄像头索引: {camera_index}, 后端: {backend}")
     
@@ -25,6 +29,8 @@ def test_camera_with_backend(camera_index, backend=None):
             print(f"❌ 摄像头 {camera_index} 无法打开")
             return False
         
+        # 单帧缓冲：read()拿到的是最新帧，不是驱动环形缓冲里的旧帧
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         print(f"✅ 摄像头 {camera_index} 已打开")
         
         # 尝试读取一帧
@@ -37,17 +43,16 @@ def test_camera_with_backend(camera_index, backend=None):
         
         print(f"✅ 摄像头 {camera_index} 可以读取帧 (尺寸: {frame.shape})")
         
-        # 保存测试图片
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        backend_name = backend.__name__ if backend else "default"
-        filename = f"test_camera_{camera_index}_{backend_name}_{timestamp}.jpg"
+        # 保存测试图片（时间戳和uploads目录在main里备好，循环内不重复做）
+        backend_name = str(backend) if backend else "default"
+        filename = f"test_camera_{camera_index}_{backend_name}_{run_ts}.jpg"
         filepath = os.path.join("uploads", filename)
         
-        # 确保uploads目录存在
-        os.makedirs("uploads", exist_ok=True)
-        
-        # 保存图片
-        success = cv2.imwrite(filepath, frame)
+        # 保存图片（质量85+霍夫曼表优化：编码更快、文件更小，测试图足够用）
+        success = cv2.imwrite(filepath, frame,
+                              [cv2.IMWRITE_JPEG_QUALITY, 85,
+                               cv2.IMWRITE_JPEG_OPTIMIZE, 1,
+                               cv2.IMWRITE_JPEG_PROGRESSIVE, 0])
         
         if success:
             print(f"✅ 测试图片已保存: {filepath}")
@@ -79,26 +84,51 @@ def test_v4l2_devices():
     except Exception as e:
         print(f"v4l2设备检查失败: {e}")
 
-def test_camera_with_different_backends(camera_index):
+def test_camera_with_different_backends(camera_index, run_ts):
     """使用不同后端测试摄像头"""
     print(f"\n🔍 使用不同后端测试摄像头 {camera_index}...")
     
-    backends = [
-        None,  # 默认后端
-        cv2.CAP_V4L2,  # V4L2后端
-        cv2.CAP_V4L,   # V4L后端
-        cv2.CAP_ANY,   # 自动选择后端
-    ]
+    # Linux上默认/CAP_ANY/CAP_V4L最终都落到同一个V4L2实现，探一次就够；
+    # 其他平台（Windows）才有MSMF和DSHOW两套真正不同的后端可比
+    if sys.platform.startswith('linux'):
+        backends = [cv2.CAP_V4L2]
+    else:
+        backends = [cv2.CAP_MSMF, cv2.CAP_DSHOW]
     
     working_backends = []
     
     for backend in backends:
-        if test_camera_with_backend(camera_index, backend):
+        if test_camera_with_backend(camera_index, backend, run_ts):
             working_backends.append(backend)
         print("-" * 50)
     
     return working_backends
 
+def list_capture_indices():
+    """枚举/dev/video*里具备Video Capture能力的节点索引"""
+    indices = sorted(
+        int(m.group(1))
+        for m in (re.search(r'(\d+)$', p) for p in glob.glob('/dev/video*'))
+        if m
+    )
+    capture = []
+    seen_devices = set()
+    for idx in indices:
+        # 同一物理设备可能经符号链接挂出多个别名，按真实路径去重
+        real = os.path.realpath(f'/dev/video{idx}')
+        if real in seen_devices:
+            continue
+        seen_devices.add(real)
+        try:
+            result = subprocess.run(['v4l2-ctl', '-d', f'/dev/video{idx}', '--all'],
+                                    capture_output=True, text=True)
+            if result.returncode == 0 and 'Video Capture' not in result.stdout:
+                continue  # 元数据节点等不具备采集能力，跳过
+        except Exception:
+            pass  # 没装v4l2-ctl就不过滤，按存在的节点探测
+        capture.append(idx)
+    return capture
+
 def main():
     """主函数"""
     print("🔍 开始详细摄像头测试...")
@@ -106,14 +136,27 @@ def main():
     # 检查v4l2设备
     test_v4l2_devices()
     
-    # 测试多个摄像头索引
-    camera_indices = [0, 1, 2, 3, 4, 5, 6, 7]
+    # 只探测真实存在且有采集能力的节点，不再盲扫0~7
+    camera_indices = list_capture_indices()
+    if not camera_indices:
+        print("❌ 没有发现可采集的/dev/video*设备")
+        return {}
+    print(f"待测设备索引: {camera_indices}")
     working_cameras = {}
     
-    for idx in camera_indices:
-        working_backends = test_camera_with_different_backends(idx)
-        if working_backends:
-            working_cameras[idx] = working_backends
+    # 目录建一次、时间戳取一次，整轮测试共用
+    os.makedirs("uploads", exist_ok=True)
+    run_ts = time.strftime("%Y%m%d_%H%M%S")
+    
+    # 各设备相互独立、纯IO等待：按索引并行探测，总时长≈最慢的一个设备；
+    # 同一索引内部仍串行（很多摄像头不允许同一设备被并发打开）
+    with ThreadPoolExecutor(max_workers=min(8, len(camera_indices))) as pool:
+        futures = {pool.submit(test_camera_with_different_backends, idx, run_ts): idx
+                   for idx in camera_indices}
+        for future in as_completed(futures):
+            working_backends = future.result()
+            if working_backends:
+                working_cameras[futures[future]] = working_backends
     
     print(f"\n📊 测试结果:")
     for idx, backends in working_cameras.items():
@@ -5,11 +5,13 @@
 验证重构后的系统功能
 """
 
+import io
 import sys
 import os
 import time
 import threading
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 # 添加路径
 sys.path.append(os.path.join(os.path.dirname(__file__), 'Agent'))
@@ -22,13 +24,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 分隔条只拼一次；横幅用单条多行日志发出，少拿2/3的日志锁和stderr写
+_BAR = "=" * 50
+
+# 被测模块在计时开始前一次性导入：首次import的几百毫秒不再记在
+# 碰巧先跑到它的那个测试头上，缺依赖时整个套件立刻失败而不是测到一半才报
+try:
+    from Agent.core_system import core_system, EventType, SystemEvent
+    from Agent.ai_processor import ai_processor
+    from Agent.web_manager import web_manager
+    from Sensor.hardware_simulator import hardware_simulator, ButtonType, CameraType
+except ImportError as e:
+    logger.error(f"❌ 被测模块导入失败: {e}")
+    sys.exit(1)
+
+
 def test_core_system():
     """测试核心系统"""
     logger.info("🧪 测试核心系统...")
     
     try:
-        from Agent.core_system import core_system, EventType, SystemEvent
-        
         # 测试事件创建
         event = core_system.create_event(
             EventType.BUTTON_PRESS,
@@ -36,17 +51,22 @@ def test_core_system():
             {"button_type": "test_button"}
         )
         
-        # 测试事件处理器注册
+        # 测试事件处理器注册：处理器一跑就置位，主线程等它而不是睡固定时长
+        handled = threading.Event()
+        
         def test_handler(event):
             logger.info(f"✅ 事件处理器被调用: {event.event_type.value}")
+            handled.set()
         
         core_system.register_event_handler(EventType.BUTTON_PRESS, test_handler)
         
         # 测试事件发送
         core_system.emit_event(event)
         
-        # 等待事件处理
-        time.sleep(0.1)
+        # 处理器执行完立即继续，最多等1秒兜底
+        if not handled.wait(timeout=1.0):
+            logger.error("❌ 事件处理器未被调用")
+            return False
         
         logger.info("✅ 核心系统测试通过")
         return True
@@ -60,8 +80,6 @@ def test_ai_processor():
     logger.info("🧪 测试AI处理器...")
     
     try:
-        from Agent.ai_processor import ai_processor
-        
         # 测试冰箱数据加载
         inventory = ai_processor.get_fridge_inventory()
         logger.info(f"✅ 冰箱库存获取成功: {len(inventory.get('inventory', []))} 个物品")
@@ -82,8 +100,6 @@ def test_web_manager():
     logger.info("🧪 测试Web管理器...")
     
     try:
-        from Agent.web_manager import web_manager
-        
         # 测试emoji映射
         emoji = web_manager.get_food_emoji("苹果", "水果")
         logger.info(f"✅ Emoji映射测试: 苹果 -> {emoji}")
@@ -110,8 +126,6 @@ def test_hardware_simulator():
     logger.info("🧪 测试硬件模拟器...")
     
     try:
-        from Sensor.hardware_simulator import hardware_simulator, ButtonType, CameraType
-        
         # 测试按钮模拟
         hardware_simulator.simulate_button_press(ButtonType.PLACE_ITEM)
         time.sleep(0.1)
@@ -141,26 +155,25 @@ def test_event_flow():
     logger.info("🧪 测试事件流程...")
     
     try:
-        from Agent.core_system import core_system, EventType
-        from Sensor.hardware_simulator import hardware_simulator, ButtonType
-        
-        # 重置核心系统状态
+        # 重置核心系统状态：清空表就够了——注册和分发都用.get兜底，
+        # 不必再跑一遍_init_event_handlers重建每种类型的空条目
         core_system.event_handlers = {}
-        core_system._init_event_handlers()
+        core_system._wildcard_handlers = ()
         
-        # 记录事件
+        # 记录事件：Condition保护列表，处理器每追加一个就notify，
+        # 主线程按条件等待而不是睡固定时长
         events_received = []
+        received_cv = threading.Condition()
         
         def event_logger(event):
-            events_received.append(event.event_type.value)
+            with received_cv:
+                events_received.append(event.event_type.value)
+                received_cv.notify()
             logger.info(f"📨 收到事件: {event.event_type.value} from {event.source}")
         
-        # 注册事件监听器
-        for event_type in EventType:
-            core_system.register_event_handler(event_type, event_logger)
-        
-        # 等待一下确保注册完成
-        time.sleep(0.1)
+        # 注册通配监听器：一次注册收全部事件，
+        # 不再按每个EventType各挂一遍（注册同步生效，无需等待）
+        core_system.register_wildcard_handler(event_logger)
         
         # 直接发送事件，绕过防抖机制
         button_event = core_system.create_event(
@@ -169,7 +182,6 @@ def test_event_flow():
             {"button_type": "place_item"}
         )
         core_system.emit_event(button_event)
-        time.sleep(0.2)
         
         # 直接发送接近传感器事件
         proximity_event = core_system.create_event(
@@ -178,7 +190,13 @@ def test_event_flow():
             {"detected": True, "distance": "near"}
         )
         core_system.emit_event(proximity_event)
-        time.sleep(0.2)
+        
+        # 两个事件都送达就立即继续，最多等1秒兜底
+        with received_cv:
+            received_cv.wait_for(lambda: len(events_received) >= 2, timeout=1.0)
+        
+        # 摘掉通配监听器，别让它漏进后面的集成测试
+        core_system.unregister_wildcard_handler(event_logger)
         
         # 检查事件是否被正确接收
         if len(events_received) >= 2:
@@ -197,19 +215,9 @@ def test_system_integration():
     logger.info("🧪 测试系统集成...")
     
     try:
-        # 启动核心系统
-        from Agent.core_system import core_system
+        # 启动核心系统（各模块已在模块顶部导入并初始化）
         core_system.start()
         
-        # 初始化AI处理器
-        from Agent.ai_processor import ai_processor
-        
-        # 初始化Web管理器
-        from Agent.web_manager import web_manager
-        
-        # 初始化硬件模拟器
-        from Sensor.hardware_simulator import hardware_simulator
-        
         # 启动硬件监控
         hardware_simulator.start_face_detection_monitor()
         
@@ -225,26 +233,83 @@ def test_system_integration():
         logger.error(f"❌ 系统集成测试失败: {e}")
         return False
 
+class _ThreadLogFilter(logging.Filter):
+    """只放行指定线程产生的日志记录"""
+
+    def __init__(self, ident):
+        super().__init__()
+        self._ident = ident
+
+    def filter(self, record):
+        return record.thread == self._ident
+
+def _run_test_buffered(item):
+    """在工作线程里跑单个测试，日志按线程过滤进内存缓冲
+    返回: (测试名, 是否通过, 异常或None, 日志文本)"""
+    test_name, test_func = item
+    buf = io.StringIO()
+    handler = logging.StreamHandler(buf)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    handler.addFilter(_ThreadLogFilter(threading.get_ident()))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    try:
+        try:
+            ok = test_func()
+            err = None
+        except Exception as e:
+            ok, err = False, e
+    finally:
+        root.removeHandler(handler)
+    return test_name, ok, err, buf.getvalue()
+
 def run_all_tests():
     """运行所有测试"""
     logger.info("🚀 开始新架构测试...")
     
-    tests = [
+    # 前四个测试互不共享可变状态，并行跑，总时长由最慢者决定；
+    # 事件流程和系统集成会重置处理器表、启停核心系统，保持串行
+    parallel_tests = [
         ("核心系统", test_core_system),
         ("AI处理器", test_ai_processor),
         ("Web管理器", test_web_manager),
-        ("硬件模拟器", test_hardware_simulator),
+        ("硬件模拟器", test_hardware_simulator)
+    ]
+    serial_tests = [
         ("事件流程", test_event_flow),
         ("系统集成", test_system_integration)
     ]
     
     passed = 0
-    total = len(tests)
+    total = len(parallel_tests) + len(serial_tests)
+    
+    # 并行阶段的日志各自进线程专属缓冲，期间摘掉控制台处理器免得交错，
+    # 结束后按测试成组回放，输出和串行时一样可读
+    root = logging.getLogger()
+    console_handlers = root.handlers[:]
+    for h in console_handlers:
+        root.removeHandler(h)
+    try:
+        with ThreadPoolExecutor(max_workers=len(parallel_tests)) as ex:
+            results = list(ex.map(_run_test_buffered, parallel_tests))
+    finally:
+        for h in console_handlers:
+            root.addHandler(h)
+    
+    for test_name, ok, err, log_text in results:
+        logger.info("\n%s\n测试: %s\n%s", _BAR, test_name, _BAR)
+        if log_text:
+            sys.stderr.write(log_text)
+        if err is not None:
+            logger.error(f"❌ {test_name} 测试出错: {err}")
+        elif ok:
+            passed += 1
+            logger.info(f"✅ {test_name} 测试通过")
+        else:
+            logger.error(f"❌ {test_name} 测试失败")
     
-    for test_name, test_func in tests:
-        logger.info(f"\n{'='*50}")
-        logger.info(f"测试: {test_name}")
-        logger.info(f"{'='*50}")
+    for test_name, test_func in serial_tests:
+        logger.info("\n%s\n测试: %s\n%s", _BAR, test_name, _BAR)
         
         try:
             if test_func():
@@ -255,9 +320,7 @@ def run_all_tests():
         except Exception as e:
             logger.error(f"❌ {test_name} 测试出错: {e}")
     
-    logger.info(f"\n{'='*50}")
-    logger.info(f"测试结果: {passed}/{total} 通过")
-    logger.info(f"{'='*50}")
+    logger.info("\n%s\n测试结果: %d/%d 通过\n%s", _BAR, passed, total, _BAR)
     
     if passed == total:
         logger.info("🎉 所有测试通过！新架构工作正常。")